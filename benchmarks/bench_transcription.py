@@ -0,0 +1,130 @@
+"""Compares transcription backends on pinned voiceover fixtures.
+
+Fixtures are synthesized with edge-tts from fixed text, voice, rate and pitch (independent of config.json),
+and their SHA-256 is recorded in benchmarks/fixture_hashes.json. A run refuses to compare against audio that
+no longer matches the recorded hashes (e.g. the TTS service changed its voice), since the numbers would not
+be comparable with earlier runs; pass --rebaseline to accept the new audio and start a new baseline.
+
+Reports load time, real-time factor (transcribe seconds / audio seconds) and how closely each
+backend's word timestamps agree with the openai-whisper reference.
+
+Usage: python -m benchmarks.bench_transcription [--rebaseline] [backend[:compute_type] ...]
+"""
+import os
+import re
+import sys
+import time
+import json
+import asyncio
+import difflib
+import statistics
+import ffmpeg
+from src.utils import file_sha256
+from src.subtitle_sync import BACKENDS, get_transcription_settings
+from src.voiceover_gen import _synthesize
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIXTURE_MANIFEST = os.path.join(os.path.dirname(__file__), "fixture_hashes.json")
+REFERENCE_BACKEND = "openai-whisper"
+
+# Pinned so fixtures do not change with the project's voice settings
+FIXTURE_VOICE = {"voice": "en-US-ChristopherNeural", "rate": "+0%", "pitch": "+0Hz"}
+
+# Fixed narration covering short hooks, numbers and a longer explainer passage
+FIXTURE_TEXTS = {
+    "hook": "Did you know that the Roman Empire lasted for over a thousand years, before finally falling in 476 AD?",
+    "numbers": "In 1969, three astronauts travelled 384,400 kilometres to the Moon, and the whole trip took just eight days.",
+    "explainer": (
+        "The ocean is salty because rain slowly dissolves minerals from rocks on land. "
+        "Rivers carry those minerals to the sea, where the water evaporates but the salt stays behind. "
+        "Over hundreds of millions of years, that tiny trickle added up to the oceans we know today. "
+        "Wait, it gets stranger: hydrothermal vents on the seafloor add even more."
+    ),
+}
+
+def ensure_fixtures(rebaseline: bool = False) -> dict:
+    """Synthesizes any missing fixture and checks every fixture against the recorded hashes."""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    manifest = {}
+    if os.path.exists(FIXTURE_MANIFEST):
+        with open(FIXTURE_MANIFEST) as f:
+            manifest = json.load(f)
+
+    paths, changed = {}, []
+    for name, text in FIXTURE_TEXTS.items():
+        path = os.path.join(FIXTURE_DIR, f"{name}.mp3")
+        spec = dict(FIXTURE_VOICE, text=text)
+        recorded = manifest.get(name)
+        if recorded and recorded["spec"] != spec and os.path.exists(path):
+            os.remove(path)  # text or voice was edited, so the old audio is a different fixture
+        if not os.path.exists(path):
+            asyncio.run(_synthesize(text, path, **FIXTURE_VOICE))
+        digest = file_sha256(path)
+        if recorded and recorded["spec"] == spec and recorded["sha256"] != digest and not rebaseline:
+            changed.append(name)
+        elif not recorded or recorded["spec"] != spec or recorded["sha256"] != digest:
+            print(f"Recording new baseline audio for fixture '{name}'.")
+            manifest[name] = {"spec": spec, "sha256": digest}
+        paths[name] = path
+
+    if changed:
+        raise SystemExit(f"Fixture audio differs from {FIXTURE_MANIFEST} for: {', '.join(changed)}. "
+                         "Results would not be comparable with earlier runs; pass --rebaseline to accept it.")
+    with open(FIXTURE_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return paths
+
+def _normalize(word: str) -> str:
+    return re.sub(r"\W", "", word).lower()
+
+def timestamp_agreement(reference: list[dict], candidate: list[dict]) -> dict:
+    """Aligns the two word sequences and measures start/end error on the words both backends heard."""
+    matcher = difflib.SequenceMatcher(a=[_normalize(w["word"]) for w in reference],
+                                      b=[_normalize(w["word"]) for w in candidate], autojunk=False)
+    errors = []
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            ref, cand = reference[block.a + k], candidate[block.b + k]
+            errors.append(max(abs(ref["start"] - cand["start"]), abs(ref["end"] - cand["end"])))
+    return {
+        "word_match": len(errors) / max(len(reference), 1),
+        "mean_error": statistics.mean(errors) if errors else float("nan"),
+        "within_100ms": sum(e <= 0.1 for e in errors) / max(len(errors), 1),
+    }
+
+def run_benchmark(variants: list[str], rebaseline: bool = False):
+    fixtures = ensure_fixtures(rebaseline)
+    base = get_transcription_settings()
+    results = {}
+
+    for variant in [REFERENCE_BACKEND] + [v for v in variants if v != REFERENCE_BACKEND]:
+        backend_name, _, compute_type = variant.partition(":")
+        settings = dict(base, backend=backend_name, compute_type=compute_type or base["compute_type"])
+
+        load_start = time.perf_counter()
+        backend = BACKENDS[backend_name](settings)
+        load_time = time.perf_counter() - load_start
+
+        runs = {}
+        for name, path in fixtures.items():
+            duration = float(ffmpeg.probe(path)["format"]["duration"])
+            start = time.perf_counter()
+            words = backend.transcribe(path)
+            runs[name] = {"words": words, "rtf": (time.perf_counter() - start) / duration}
+        results[variant] = {"load": load_time, "runs": runs}
+
+    reference = results[REFERENCE_BACKEND]["runs"]
+    print(f"\n{'backend':<26}{'load s':>8}{'RTF':>8}{'match':>8}{'err ms':>8}{'<=100ms':>9}")
+    for variant, result in results.items():
+        rtf = statistics.mean(r["rtf"] for r in result["runs"].values())
+        agreements = [timestamp_agreement(reference[name]["words"], run["words"]) for name, run in result["runs"].items()]
+        print(f"{variant:<26}{result['load']:>8.1f}{rtf:>8.3f}"
+              f"{statistics.mean(a['word_match'] for a in agreements):>8.1%}"
+              f"{statistics.mean(a['mean_error'] for a in agreements) * 1000:>8.0f}"
+              f"{statistics.mean(a['within_100ms'] for a in agreements):>9.1%}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rebaseline = "--rebaseline" in args
+    variants = [a for a in args if a != "--rebaseline"]
+    run_benchmark(variants or ["faster-whisper:int8"], rebaseline)
@@ -0,0 +1,126 @@
+import os
+
+# Named colours accepted in config.json, as (R, G, B)
+_NAMED_COLORS = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "yellow": (255, 255, 0),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "orange": (255, 165, 0),
+}
+
+def ass_color(color: str) -> str:
+    """Converts a colour name or '#RRGGBB' string into an ASS &HAABBGGRR colour."""
+    value = color.strip().lower()
+    if value in _NAMED_COLORS:
+        r, g, b = _NAMED_COLORS[value]
+    elif value.startswith("#") and len(value) == 7:
+        r, g, b = (int(value[i:i + 2], 16) for i in (1, 3, 5))
+    else:
+        raise ValueError(f"Unsupported subtitle colour: {color}")
+    return f"&H00{b:02X}{g:02X}{r:02X}"
+
+def format_ass_time(seconds: float) -> str:
+    """Format seconds as H:MM:SS.cc for ASS."""
+    centis = int(round(max(seconds, 0) * 100))
+    h, centis = divmod(centis, 360000)
+    m, centis = divmod(centis, 6000)
+    s, centis = divmod(centis, 100)
+    return f"{h}:{m:02d}:{s:02d}.{centis:02d}"
+
+def resolve_font(font_family: str) -> tuple[str, str | None]:
+    """Returns (font name, fonts directory) for libass from a font file path or family name."""
+    if os.path.isfile(font_family):
+        # e.g. /usr/share/fonts/truetype/lato/Lato-Regular.ttf -> "Lato"
+        stem = os.path.splitext(os.path.basename(font_family))[0]
+        return stem.split("-")[0], os.path.dirname(font_family)
+    return font_family, None
+
+def _escape_text(text: str) -> str:
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")").replace("\n", " ")
+
+def group_words_into_lines(words: list[dict], max_words: int) -> list[list[dict]]:
+    """Group words into caption lines, breaking on punctuation or the max word limit."""
+    lines = []
+    current = []
+    for w in words:
+        current.append(w)
+        if any(p in w['word'] for p in ['.', ',', '!', '?']) or len(current) >= max_words:
+            lines.append(current)
+            current = []
+    if current:
+        lines.append(current)
+    return lines
+
+def _karaoke_events(line: list[dict], highlight: str) -> list[tuple[float, float, str]]:
+    """One event per word: the whole line stays on screen and only the active word is recoloured."""
+    events = []
+    line_end = line[-1]['end']
+    for i, active in enumerate(line):
+        start = active['start']
+        # Hold the highlight until the next word starts so the line never blinks
+        end = line[i + 1]['start'] if i + 1 < len(line) else line_end
+        if end <= start:
+            continue
+        parts = []
+        for j, w in enumerate(line):
+            text = _escape_text(w['word'])
+            parts.append(f"{{\\c{highlight}&}}{text}{{\\r}}" if j == i else text)
+        events.append((start, end, " ".join(parts)))
+    return events
+
+def write_ass(word_timestamps: list[dict], ass_path: str, config: dict) -> str:
+    """Writes a karaoke-style ASS subtitle track: one caption line at a time, active word highlighted."""
+    target_w, target_h = config['video_settings']['resolution']
+    subs = config['visuals_and_subtitles']
+    font_name, _ = resolve_font(subs['font_family'])
+    highlight = ass_color(subs.get('active_word_highlight_color', subs['text_color']))
+
+    style = ",".join(str(v) for v in [
+        "Default", font_name, subs['font_size'],
+        ass_color(subs['text_color']), ass_color(subs['text_color']),
+        ass_color(subs['stroke_color']), "&H00000000",
+        0, 0, 0, 0, 100, 100, 0, 0,
+        1, subs['stroke_width'], 0,
+        5, 50, 50, 0, 1
+    ])
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {target_w}",
+        f"PlayResY: {target_h}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: {style}",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for line in group_words_into_lines(word_timestamps, subs['max_words_per_line']):
+        for start, end, text in _karaoke_events(line, highlight):
+            lines.append(f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{text}")
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return ass_path
+
+def ass_filter_arg(ass_path: str, config: dict) -> str:
+    """Builds the '-vf' value that burns ass_path with libass, for encoders that take raw ffmpeg params."""
+    def esc(value):
+        return value.replace("\\", "/").replace("'", "\\'").replace(":", "\\:")
+
+    arg = f"ass=filename={esc(ass_path)}"
+    _, fonts_dir = resolve_font(config['visuals_and_subtitles']['font_family'])
+    if fonts_dir:
+        arg += f":fontsdir={esc(fonts_dir)}"
+    return arg
@@ -0,0 +1,139 @@
+import os
+import time
+import shutil
+import sqlite3
+from .utils import load_config, get_cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    video_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (video_id, file_id, seconds)
+);
+"""
+
+# Entries looked up or added this recently are never evicted, so a path just returned by lookup()/add()
+# stays on disk until the caller has linked it into the project
+EVICTION_GRACE_SECONDS = 600
+
+class AssetStore:
+    """Content store for Pexels clips shared by every project, keyed by (video id, rendition id, head seconds).
+
+    seconds == 0 marks a full download; a head-only clip satisfies any request for that many seconds or fewer.
+    Projects get hardlinks (or copies where the filesystem cannot link), so evicting a store entry never breaks them.
+    """
+
+    def __init__(self, root: str, max_bytes: int, grace_seconds: float = EVICTION_GRACE_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self.staging_dir = os.path.join(root, "staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+
+    def lookup(self, video_id: int, file_id: int, seconds: float = 0) -> str | None:
+        """Returns the stored clip that covers the request (full file or a long enough head), or None."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seconds, filename FROM assets WHERE video_id = ? AND file_id = ? AND (seconds = 0 OR seconds >= ?) "
+                "ORDER BY seconds = 0, seconds",
+                (video_id, file_id, seconds or float("inf")),
+            ).fetchall()
+            for stored_seconds, filename in rows:
+                path = os.path.join(self.root, filename)
+                if os.path.exists(path):
+                    conn.execute(
+                        "UPDATE assets SET last_used = ? WHERE video_id = ? AND file_id = ? AND seconds = ?",
+                        (time.time(), video_id, file_id, stored_seconds),
+                    )
+                    return path
+                # Deleted behind our back; forget it
+                conn.execute(
+                    "DELETE FROM assets WHERE video_id = ? AND file_id = ? AND seconds = ?",
+                    (video_id, file_id, stored_seconds),
+                )
+        return None
+
+    def staging_path(self, video_id: int, file_id: int, seconds: float = 0) -> str:
+        """Where a downloader should write a clip before it is added (same filesystem, so add() is a rename)."""
+        return os.path.join(self.staging_dir, self._filename(video_id, file_id, seconds))
+
+    def _filename(self, video_id: int, file_id: int, seconds: float) -> str:
+        suffix = f"_head{seconds:g}" if seconds else ""
+        return f"{video_id}_{file_id}{suffix}.mp4"
+
+    def add(self, video_id: int, file_id: int, seconds: float, source_path: str) -> str:
+        """Moves a finished download into the store and indexes it. Returns its store path."""
+        filename = self._filename(video_id, file_id, seconds)
+        path = os.path.join(self.root, filename)
+        os.replace(source_path, path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, file_id, seconds, filename, os.path.getsize(path), time.time()),
+            )
+        self.prune()
+        return path
+
+    def link(self, store_path: str, dest_path: str) -> str:
+        """Places a stored clip at dest_path as a hardlink, falling back to a copy across filesystems."""
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(store_path, dest_path)
+        except OSError:
+            shutil.copyfile(store_path, dest_path)
+        return dest_path
+
+    def prune(self) -> int:
+        """Evicts least-recently-used clips until the store fits its budget. Returns bytes freed.
+
+        Clips used within the grace window are skipped, so the store can briefly run over budget.
+        """
+        cutoff = time.time() - self.grace_seconds
+        with self._connect() as conn:
+            rows = conn.execute("SELECT video_id, file_id, seconds, filename, size, last_used FROM assets ORDER BY last_used").fetchall()
+            total = sum(row[4] for row in rows)
+            freed = 0
+            for video_id, file_id, seconds, filename, size, last_used in rows:
+                if total <= self.max_bytes or last_used >= cutoff:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, filename))
+                except FileNotFoundError:
+                    pass  # already evicted by another process sharing the store
+                conn.execute(
+                    "DELETE FROM assets WHERE video_id = ? AND file_id = ? AND seconds = ?",
+                    (video_id, file_id, seconds),
+                )
+                total -= size
+                freed += size
+        return freed
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM assets").fetchone()
+        return {"assets": count, "bytes": size, "max_bytes": self.max_bytes}
+
+_STORE = None
+
+def get_asset_store(config: dict = None) -> AssetStore:
+    """Process-wide store under <cache_dir>/assets, sized by caching.asset_store_max_mb."""
+    global _STORE
+    if _STORE is None:
+        config = config or load_config()
+        max_mb = config.get("caching", {}).get("asset_store_max_mb", 8192)
+        _STORE = AssetStore(get_cache_dir(config, "assets"), max_mb * 1024 * 1024)
+    return _STORE
+
+if __name__ == "__main__":
+    stats = get_asset_store().stats()
+    print(f"B-roll asset store: {stats['assets']} clips, {stats['bytes'] / 1e6:.1f} / {stats['max_bytes'] / 1e6:.0f} MB")
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import ffmpeg
+from .utils import load_config, get_cache_dir, file_sha256
+
+# Proxies are intermediates, so keep them close to lossless and seekable (1s GOP) for cheap trims
+PROXY_ENCODER_ARGS = {'vcodec': 'libx264', 'pix_fmt': 'yuv420p', 'crf': 18, 'preset': 'veryfast'}
+
+def fill_frame(stream, target_w: int, target_h: int, fps: int, prescaled: bool = False):
+    """Scale so the clip covers target_w x target_h, then centre-crop (same maths as the notebook previews).
+
+    Pass prescaled=True for B-roll proxies, which are already at the target size, SAR and frame rate.
+    """
+    if prescaled:
+        return stream
+    return (
+        stream
+        .filter('scale', w=f'if(gt(iw/ih,{target_w}/{target_h}),-2,{target_w})', h=f'if(gt(iw/ih,{target_w}/{target_h}),{target_h},-2)')
+        .filter('crop', target_w, target_h)
+        .filter('setsar', 1)
+        .filter('fps', fps)
+    )
+
+def proxy_key(source_path: str, resolution: list, fps: int, duration: float) -> str:
+    """Cache key: source content hash plus everything that shapes the transcoded proxy."""
+    payload = json.dumps({
+        'source': file_sha256(source_path),
+        'resolution': list(resolution),
+        'fps': fps,
+        'duration': duration,
+        'encoder': PROXY_ENCODER_ARGS,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def is_broll_proxy(path: str, config: dict = None) -> bool:
+    """True when path is a proxy from the B-roll cache (and so needs no further scale/crop)."""
+    config = config or load_config()
+    cache_dir = get_cache_dir(config, 'broll_proxies')
+    return os.path.dirname(os.path.abspath(path)) == os.path.abspath(cache_dir)
+
+def get_broll_proxy(source_path: str, config: dict = None, prune: bool = True) -> str:
+    """Returns a cached proxy of source_path already scaled/cropped to the target resolution, fps and pixel format.
+
+    Batch callers pass prune=False and prune once afterwards (see get_broll_proxies).
+    """
+    config = config or load_config()
+    target_w, target_h = config['video_settings']['resolution']
+    fps = config['video_settings']['fps']
+    duration = config['pacing_and_editing']['b_roll_duration_seconds']
+
+    if not os.path.exists(source_path):
+        raise FileNotFoundError(f"B-roll not found: {source_path}")
+
+    cache_dir = get_cache_dir(config, 'broll_proxies')
+    proxy_path = os.path.join(cache_dir, proxy_key(source_path, [target_w, target_h], fps, duration) + '.mp4')
+
+    if os.path.exists(proxy_path):
+        # Touch on hit so eviction is least-recently-used
+        os.utime(proxy_path)
+        return proxy_path
+
+    print(f"Building B-roll proxy for {os.path.basename(source_path)}...")
+    # Unique per build: identical sources share a key and may be transcoded by two workers at once
+    part_path = f'{proxy_path}.{uuid.uuid4().hex}.part'
+    video = fill_frame(ffmpeg.input(source_path, t=duration).video, target_w, target_h, fps)
+    try:
+        (
+            ffmpeg.output(video, part_path, format='mp4', g=fps, movflags='+faststart', **PROXY_ENCODER_ARGS)
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        print(e.stderr.decode(errors='replace')[-2000:])
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, proxy_path)
+
+    if prune:
+        prune_broll_proxies(config, keep=[proxy_path])
+    return proxy_path
+
+def get_broll_proxies(b_roll_paths: list[str], config: dict = None, workers: int = 4) -> list[str]:
+    """Maps each B-roll path to its proxy, transcoding cache misses concurrently."""
+    config = config or load_config()
+    unique = list(dict.fromkeys(b_roll_paths))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        proxies = dict(zip(unique, pool.map(lambda p: get_broll_proxy(p, config, prune=False), unique)))
+    # One prune after the batch, so concurrent workers never evict each other's (or this batch's) proxies
+    prune_broll_proxies(config, keep=proxies.values())
+    return [proxies[p] for p in b_roll_paths]
+
+def prune_broll_proxies(config: dict = None, keep=()) -> int:
+    """Evicts least-recently-used proxies until the cache fits broll_proxy_max_mb. Returns bytes freed.
+
+    Paths in `keep` are never evicted; files removed concurrently by another prune are skipped.
+    """
+    config = config or load_config()
+    max_bytes = config.get('caching', {}).get('broll_proxy_max_mb', 4096) * 1024 * 1024
+    cache_dir = get_cache_dir(config, 'broll_proxies')
+
+    keep = {os.path.abspath(p) for p in keep}
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.mp4'):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        path = os.path.join(cache_dir, name)
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+        total -= size
+    return freed
@@ -1,4 +1,5 @@
 import json
+import pprint
 
 
 def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
@@ -17,26 +18,170 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
         "outputs": [],
         "source": [
             "# 1. Setup Environment\n",
-            "!apt-get install -qq fonts-liberation > /dev/null 2>&1\n",
-            "!pip install -q openai-whisper ffmpeg-python requests google-genai pydantic kokoro soundfile torch\n",
+            "MOUNT_DRIVE_CACHE = True  # Mount Drive now so wheels, model weights and render caches persist across runtimes\n",
             "\n",
             "import os\n",
+            "import sys\n",
+            "import glob\n",
+            "import time\n",
+            "import subprocess\n",
+            "import importlib.util\n",
+            "from importlib import metadata\n",
+            "bootstrap_start = time.time()\n",
+            "\n",
+            "# Wheels and model weights persist on Drive when it is mounted, so later runtimes skip downloads and builds\n",
+            "if MOUNT_DRIVE_CACHE and not os.path.isdir('/content/drive/MyDrive'):\n",
+            "    try:\n",
+            "        from google.colab import drive\n",
+            "        drive.mount('/content/drive')\n",
+            "    except Exception as e:\n",
+            "        print(f'Drive not mounted ({e.__class__.__name__}); caches last for this runtime only.')\n",
+            "if os.path.isdir('/content/drive/MyDrive'):\n",
+            "    BOOTSTRAP_CACHE = '/content/drive/MyDrive/youtube-video-generator/.cache'\n",
+            "else:\n",
+            "    BOOTSTRAP_CACHE = '/content/cache'\n",
+            "WHEEL_DIR = os.path.join(BOOTSTRAP_CACHE, 'wheels')\n",
+            "MODEL_DIR = os.path.join(BOOTSTRAP_CACHE, 'models')\n",
+            "os.makedirs(WHEEL_DIR, exist_ok=True)\n",
+            "os.makedirs(MODEL_DIR, exist_ok=True)\n",
+            "# Must be set before huggingface_hub is imported (Kokoro pulls its weights and voices through it)\n",
+            "os.environ['HF_HOME'] = os.path.join(MODEL_DIR, 'huggingface')\n",
+            "\n",
+            "# import name -> pip requirement\n",
+            "REQUIREMENTS = {\n",
+            "    'whisper': 'openai-whisper', 'ffmpeg': 'ffmpeg-python', 'requests': 'requests', 'google.genai': 'google-genai',\n",
+            "    'pydantic': 'pydantic', 'kokoro': 'kokoro', 'soundfile': 'soundfile', 'torch': 'torch',\n",
+            "}\n",
+            "\n",
+            "def importable(module):\n",
+            "    try:\n",
+            "        return importlib.util.find_spec(module) is not None\n",
+            "    except ModuleNotFoundError:\n",
+            "        return False\n",
+            "\n",
+            "def pip(*args):\n",
+            "    return subprocess.run([sys.executable, '-m', 'pip', *args], capture_output=True, text=True).returncode == 0\n",
+            "\n",
+            "def installed_versions():\n",
+            "    return {d.metadata['Name'].lower(): d.version for d in metadata.distributions()}\n",
+            "\n",
+            "if not os.path.isdir('/usr/share/fonts/truetype/liberation'):\n",
+            "    subprocess.run(['apt-get', 'install', '-qq', 'fonts-liberation'], capture_output=True)\n",
+            "\n",
+            "missing = [pkg for module, pkg in REQUIREMENTS.items() if not importable(module)]\n",
+            "if missing:\n",
+            "    before = installed_versions()\n",
+            "    # Offline install from the wheel cache first; anything it cannot satisfy comes from PyPI\n",
+            "    if glob.glob(os.path.join(WHEEL_DIR, '*.whl')) and pip('install', '-q', '--no-index', '--find-links', WHEEL_DIR, *missing):\n",
+            "        print(f'Installed {\", \".join(missing)} from the wheel cache.')\n",
+            "    else:\n",
+            "        print(f'Installing {\", \".join(missing)} from PyPI...')\n",
+            "        if not pip('install', '-q', *missing):\n",
+            "            raise RuntimeError(f'pip install failed for: {missing}')\n",
+            "        # Keep wheels of everything that was just installed (including built sdists like openai-whisper) for next time\n",
+            "        added = [f'{name}=={version}' for name, version in installed_versions().items() if before.get(name) != version]\n",
+            "        pip('wheel', '-q', '--no-deps', '-w', WHEEL_DIR, *added)\n",
+            "    importlib.invalidate_caches()\n",
+            "else:\n",
+            "    print('All dependencies already importable; skipping pip.')\n",
+            "\n",
             "import json\n",
             "import asyncio\n",
             "import requests\n",
             "import random\n",
-            "import subprocess\n",
             "import whisper\n",
             "import ffmpeg\n",
+            "import torch\n",
+            "from concurrent.futures import ThreadPoolExecutor\n",
             "from IPython.display import Video, display, HTML\n",
             "from google.colab import drive\n",
             "\n",
-            "print('Dependencies installed and imported successfully.')"
+            "# Pipeline bookkeeping: stages run on background threads and record their timings for the critical-path report\n",
+            "STAGE_TIMES = {}\n",
+            "STAGE_WAITS = {}\n",
+            "if 'stage_pool' not in globals():\n",
+            "    stage_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='stage')\n",
+            "\n",
+            "# The runtime requests a T4; models go on the GPU when it is there and fall back to the CPU otherwise\n",
+            "DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'\n",
+            "\n",
+            "def timed_stage(name, fn, *args, **kwargs):\n",
+            "    \"\"\"Run fn, recording its (start, end) under STAGE_TIMES[name].\"\"\"\n",
+            "    start = time.time()\n",
+            "    STAGE_WAITS[name] = 0.0\n",
+            "    try:\n",
+            "        return fn(*args, **kwargs)\n",
+            "    finally:\n",
+            "        STAGE_TIMES[name] = (start, time.time())\n",
+            "\n",
+            "def load_on_device(load, label):\n",
+            "    \"\"\"load(device) on the GPU when present; on failure (e.g. out of GPU memory) retry on the CPU.\"\"\"\n",
+            "    if DEVICE == 'cuda':\n",
+            "        try:\n",
+            "            return load('cuda')\n",
+            "        except RuntimeError as e:\n",
+            "            print(f'{label} could not load on the GPU ({e.__class__.__name__}); using the CPU.')\n",
+            "            torch.cuda.empty_cache()\n",
+            "    return load('cpu')\n",
+            "\n",
+            "def load_kokoro(lang_code='a'):\n",
+            "    from kokoro import KPipeline\n",
+            "    return load_on_device(lambda device: KPipeline(lang_code=lang_code, device=device), 'Kokoro')\n",
+            "\n",
+            "WHISPER_DIR = os.path.join(MODEL_DIR, 'whisper')\n",
+            "MODEL_LOADERS = {\n",
+            "    'kokoro': load_kokoro,\n",
+            "    'whisper': lambda: load_on_device(lambda device: whisper.load_model('base', device=device, download_root=WHISPER_DIR), 'Whisper'),\n",
+            "}\n",
+            "# Loaded models survive re-running this cell (or any other) for the rest of the kernel session\n",
+            "if 'model_futures' not in globals():\n",
+            "    model_futures = {}\n",
+            "\n",
+            "def preload_model(name):\n",
+            "    \"\"\"Start loading a model in the background (once); returns its future.\"\"\"\n",
+            "    if name not in model_futures:\n",
+            "        model_futures[name] = stage_pool.submit(timed_stage, f'load {name}', MODEL_LOADERS[name])\n",
+            "    return model_futures[name]\n",
+            "\n",
+            "def get_model(name, waiting_stage=None):\n",
+            "    \"\"\"Block until the model is loaded, charging the wait to waiting_stage so it is not double counted.\"\"\"\n",
+            "    start = time.time()\n",
+            "    model = preload_model(name).result()\n",
+            "    if waiting_stage:\n",
+            "        STAGE_WAITS[waiting_stage] = STAGE_WAITS.get(waiting_stage, 0.0) + time.time() - start\n",
+            "    return model\n",
+            "\n",
+            "def report_critical_path(names, since):\n",
+            "    \"\"\"Wall-clock time of the overlapped stages since `since` vs. running them back to back.\"\"\"\n",
+            "    # Work that finished before the pipeline started (e.g. a model loaded during cell 1) is off the critical path\n",
+            "    spans = {n: (max(STAGE_TIMES[n][0], since), STAGE_TIMES[n][1]) for n in names if n in STAGE_TIMES and STAGE_TIMES[n][1] > since}\n",
+            "    if not spans:\n",
+            "        return\n",
+            "    busy = {n: max(end - start - STAGE_WAITS.get(n, 0.0), 0.0) for n, (start, end) in spans.items()}\n",
+            "    critical = max(end for _, end in spans.values()) - since\n",
+            "    serial = sum(busy.values())\n",
+            "    print('Stage times: ' + ', '.join(f'{n} {t:.1f}s' for n, t in busy.items()))\n",
+            "    print(f'Critical path {critical:.1f}s vs {serial:.1f}s back to back ({serial / max(critical, 1e-6):.1f}x from overlap)')\n",
+            "\n",
+            "def cache_model_weights():\n",
+            "    \"\"\"Fetch Whisper base and every Kokoro voice into MODEL_DIR (no-op once they are there).\"\"\"\n",
+            "    from huggingface_hub import snapshot_download\n",
+            "    snapshot_download('hexgrad/Kokoro-82M', allow_patterns=['*.json', '*.pth', 'voices/*.pt'])\n",
+            "    # Public API only: a CPU load downloads and checksums the weights into WHISPER_DIR; the model is discarded\n",
+            "    if not os.path.exists(os.path.join(WHISPER_DIR, 'base.pt')):\n",
+            "        whisper.load_model('base', device='cpu', download_root=WHISPER_DIR)\n",
+            "\n",
+            "# Kokoro is needed by the audio cell on every fresh runtime; start loading it now. Whisper is only a fallback, so it loads on demand.\n",
+            "preload_model('kokoro')\n",
+            "weights_future = stage_pool.submit(timed_stage, 'cache weights', cache_model_weights)\n",
+            "\n",
+            "print(f'Dependencies ready in {time.time() - bootstrap_start:.1f}s. Models load on: {DEVICE}')"
         ]
     }
     
     # 2. Inject Configuration & Data
-    config_str = json.dumps(config, indent=4)
+    # Python literal, not JSON: the cell is executed as code, where JSON's true/false/null are undefined names
+    config_str = pprint.pformat(config, sort_dicts=False, width=100)
     scenes_str = json.dumps(scenes, indent=4)
     
     cell_config = {
@@ -56,7 +201,15 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "# Create a working directory\n",
             "PROJECT_DIR = f'/content/{TOPIC_SLUG}'\n",
             "os.makedirs(PROJECT_DIR, exist_ok=True)\n",
-            "print(f'Project workspace initialized at {PROJECT_DIR}')"
+            "\n",
+            "# Caches survive runtime resets when Drive is mounted, otherwise they live for this session\n",
+            "if os.path.isdir('/content/drive/MyDrive'):\n",
+            "    CACHE_ROOT = '/content/drive/MyDrive/youtube-video-generator/.cache'\n",
+            "else:\n",
+            "    CACHE_ROOT = '/content/cache'\n",
+            "os.makedirs(CACHE_ROOT, exist_ok=True)\n",
+            "print(f'Project workspace initialized at {PROJECT_DIR}')\n",
+            "print(f'Cache directory: {CACHE_ROOT}')"
         ]
     }
     
@@ -124,50 +277,157 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
         "outputs": [],
         "source": [
             "# 4. Generate Audio & Timestamps\n",
-            "from kokoro import KPipeline\n",
+            "# Runs in the background so the B-roll cell can fetch footage at the same time; cell 5 waits for it to finish.\n",
             "import soundfile as sf\n",
             "import numpy as np\n",
             "\n",
+            "def kokoro_word_timestamps(tokens, offset):\n",
+            "    \"\"\"Turn Kokoro's per-token timings into {word, start, end} dicts; None if any word has no timing.\"\"\"\n",
+            "    words = []\n",
+            "    for tok in tokens or []:\n",
+            "        if not tok.text.strip():\n",
+            "            continue\n",
+            "        if tok.start_ts is None or tok.end_ts is None:\n",
+            "            # Punctuation has no timing of its own; glue it to the previous word like Whisper does\n",
+            "            if words and not any(c.isalnum() for c in tok.text):\n",
+            "                words[-1]['word'] += tok.text\n",
+            "                continue\n",
+            "            return None\n",
+            "        words.append({'word': tok.text, 'start': offset + tok.start_ts, 'end': offset + tok.end_ts})\n",
+            "    return words\n",
+            "\n",
+            "import hashlib\n",
+            "SAMPLE_RATE = 24000  # Kokoro outputs 24kHz audio\n",
+            "TTS_CACHE_DIR = os.path.join(CACHE_ROOT, 'tts_scenes')\n",
+            "os.makedirs(TTS_CACHE_DIR, exist_ok=True)\n",
+            "\n",
+            "def synthesize_scene(get_pipeline, text, voice, lang_code, out, speed=1):\n",
+            "    \"\"\"Stream one scene into the open voiceover file `out`, reusing cached audio when\n",
+            "    (text, voice, lang, speed, engine) is unchanged. Returns (duration, words, cached).\"\"\"\n",
+            "    key = hashlib.sha256(json.dumps({'text': text, 'voice': voice, 'lang': lang_code, 'speed': speed, 'engine': 'kokoro'}, sort_keys=True).encode()).hexdigest()\n",
+            "    wav_path = os.path.join(TTS_CACHE_DIR, f'{key}.wav')\n",
+            "    words_path = os.path.join(TTS_CACHE_DIR, f'{key}.json')\n",
+            "    if os.path.exists(wav_path) and os.path.exists(words_path):\n",
+            "        with sf.SoundFile(wav_path) as cached_f:\n",
+            "            frames = cached_f.frames\n",
+            "            for block in cached_f.blocks(blocksize=SAMPLE_RATE * 10, dtype='float32'):\n",
+            "                out.write(block)\n",
+            "        with open(words_path) as f:\n",
+            "            return frames / SAMPLE_RATE, json.load(f)['words'], True\n",
+            "\n",
+            "    # Chunks go straight to both the scene cache and the voiceover file; nothing is held for the whole narration\n",
+            "    words = []\n",
+            "    offset = 0.0\n",
+            "    part_path = wav_path + '.part'\n",
+            "    with sf.SoundFile(part_path, 'w', SAMPLE_RATE, 1, format='WAV') as scene_f:\n",
+            "        for result in get_pipeline()(text, voice=voice, speed=speed, split_pattern=r'\\n+'):\n",
+            "            audio = np.asarray(result.audio, dtype=np.float32)\n",
+            "            scene_f.write(audio)\n",
+            "            out.write(audio)\n",
+            "            # Kokoro reports token timings for English voices, so Whisper is only needed as a fallback\n",
+            "            if words is not None:\n",
+            "                chunk_words = kokoro_word_timestamps(result.tokens, offset)\n",
+            "                words = None if chunk_words is None else words + chunk_words\n",
+            "            offset += len(audio) / SAMPLE_RATE\n",
+            "    os.replace(part_path, wav_path)\n",
+            "    with open(words_path, 'w') as f:\n",
+            "        json.dump({'words': words}, f)\n",
+            "    return offset, words, False\n",
+            "\n",
             "def generate_voiceover():\n",
-            "    full_script_text = ' '.join([scene['text'] for scene in SCENES])\n",
             "    voiceover_path = os.path.join(PROJECT_DIR, 'voiceover.wav')\n",
             "    \n",
             "    # We'll default to 'a' (American English) and 'a_v2' (Male voice)\n",
             "    # We can eventually map our tone_hint to specific Kokoro voices if needed\n",
             "    lang_code = 'a'\n",
             "    voice = 'am_adam'  # Or 'af_heart' for female\n",
+            "    padding = CONFIG['pacing_and_editing']['padding_between_sentences_seconds']\n",
             "    \n",
-            "    print(f'Loading Kokoro pipeline for {lang_code}...')\n",
-            "    pipeline = KPipeline(lang_code=lang_code)\n",
+            "    # Kokoro has been loading since cell 1; only wait for it if a scene is missing from the cache\n",
+            "    def get_pipeline():\n",
+            "        return get_model('kokoro', waiting_stage='audio')\n",
             "    \n",
             "    print(f'Generating voiceover using voice \\'{voice}\\'...')\n",
-            "    generator = pipeline(full_script_text, voice=voice, speed=1, split_pattern=r'\\n+')\n",
-            "    \n",
-            "    all_audio = []\n",
-            "    for _, _, audio in generator:\n",
-            "        all_audio.append(audio)\n",
-            "    \n",
-            "    # Concatenate all generated audio chunks\n",
-            "    final_audio = np.concatenate(all_audio)\n",
-            "    sf.write(voiceover_path, final_audio, 24000) # Kokoro outputs 24kHz audio\n",
-            "    return voiceover_path\n",
-            "\n",
-            "voiceover_path = generate_voiceover()\n",
-            "print('Voiceover saved.')\n",
-            "\n",
-            "print('Loading Whisper model for subtitle sync...')\n",
-            "model = whisper.load_model('base')\n",
-            "result = model.transcribe(voiceover_path, word_timestamps=True)\n",
-            "\n",
-            "timestamps = []\n",
-            "for segment in result.get('segments', []):\n",
-            "    for word in segment.get('words', []):\n",
-            "        timestamps.append({\n",
-            "            'word': word['word'].strip(),\n",
-            "            'start': word['start'],\n",
-            "            'end': word['end']\n",
-            "        })\n",
-            "print(f'Transcription complete. Found {len(timestamps)} words.')"
+            "    word_timestamps = []\n",
+            "    scene_offsets = []\n",
+            "    cursor = 0.0\n",
+            "    reused = 0\n",
+            "    with sf.SoundFile(voiceover_path, 'w', SAMPLE_RATE, 1, format='WAV') as out:\n",
+            "        for i, scene in enumerate(SCENES):\n",
+            "            duration, words, cached = synthesize_scene(get_pipeline, scene['text'], voice, lang_code, out)\n",
+            "            reused += cached\n",
+            "            scene_offsets.append({'scene': i, 'start': cursor, 'end': cursor + duration})\n",
+            "            # Unchanged scenes keep their cached word timings, shifted to the scene's new position\n",
+            "            if word_timestamps is not None and words is not None:\n",
+            "                word_timestamps += [{'word': w['word'], 'start': w['start'] + cursor, 'end': w['end'] + cursor} for w in words]\n",
+            "            else:\n",
+            "                word_timestamps = None\n",
+            "            cursor += duration\n",
+            "            if i < len(SCENES) - 1 and padding > 0:\n",
+            "                out.write(np.zeros(int(padding * SAMPLE_RATE), dtype=np.float32))\n",
+            "                cursor += int(padding * SAMPLE_RATE) / SAMPLE_RATE\n",
+            "    print(f'{reused}/{len(SCENES)} scenes reused from the TTS cache.')\n",
+            "    return voiceover_path, word_timestamps, scene_offsets\n",
+            "\n",
+            "import gzip\n",
+            "TRANSCRIPT_DIR = os.path.join(CACHE_ROOT, 'transcripts')\n",
+            "os.makedirs(TRANSCRIPT_DIR, exist_ok=True)\n",
+            "transcript_cache_stats = globals().get('transcript_cache_stats', {'hits': 0, 'misses': 0})\n",
+            "\n",
+            "def transcribe_cached(audio_path, model_name='base', options={'word_timestamps': True}):\n",
+            "    \"\"\"Whisper transcription keyed by audio content, model and options; identical audio is never transcribed twice.\"\"\"\n",
+            "    with open(audio_path, 'rb') as f:\n",
+            "        audio_sha = hashlib.sha256(f.read()).hexdigest()\n",
+            "    key = hashlib.sha256(json.dumps({'audio': audio_sha, 'model': model_name, 'options': options}, sort_keys=True).encode()).hexdigest()\n",
+            "    cache_path = os.path.join(TRANSCRIPT_DIR, f'{key}.json.gz')\n",
+            "    if os.path.exists(cache_path):\n",
+            "        transcript_cache_stats['hits'] += 1\n",
+            "        with gzip.open(cache_path, 'rt', encoding='utf-8') as f:\n",
+            "            return [{'word': w, 'start': s, 'end': e} for w, s, e in json.load(f)['words']]\n",
+            "    transcript_cache_stats['misses'] += 1\n",
+            "\n",
+            "    print('Loading Whisper model for subtitle sync...')\n",
+            "    model = get_model('whisper', waiting_stage='audio') if model_name == 'base' else whisper.load_model(model_name)\n",
+            "    result = model.transcribe(audio_path, fp16=model.device.type == 'cuda', **options)\n",
+            "\n",
+            "    words = []\n",
+            "    for segment in result.get('segments', []):\n",
+            "        for word in segment.get('words', []):\n",
+            "            words.append({\n",
+            "                'word': word['word'].strip(),\n",
+            "                'start': word['start'],\n",
+            "                'end': word['end']\n",
+            "            })\n",
+            "    with gzip.open(cache_path, 'wt', encoding='utf-8') as f:\n",
+            "        json.dump({'model': model_name, 'options': options,\n",
+            "                   'words': [[w['word'], round(w['start'], 3), round(w['end'], 3)] for w in words]}, f, separators=(',', ':'))\n",
+            "    return words\n",
+            "\n",
+            "def run_audio_stage():\n",
+            "    voiceover_path, timestamps, scene_offsets = generate_voiceover()\n",
+            "    print('Voiceover saved.')\n",
+            "    if timestamps:\n",
+            "        print(f'Using {len(timestamps)} word timestamps from Kokoro (Whisper skipped).')\n",
+            "    else:\n",
+            "        timestamps = transcribe_cached(voiceover_path)\n",
+            "        print(f'Transcription complete. Found {len(timestamps)} words.')\n",
+            "        print(f\"Transcript cache: {transcript_cache_stats['hits']} hits, {transcript_cache_stats['misses']} misses\")\n",
+            "    return voiceover_path, timestamps, scene_offsets\n",
+            "\n",
+            "def wait_for_audio():\n",
+            "    \"\"\"Joins the background audio stage and publishes voiceover_path / timestamps / SCENE_OFFSETS.\n",
+            "    Every cell that uses the audio outputs calls this first; it returns at once after the first join.\"\"\"\n",
+            "    global voiceover_path, timestamps, SCENE_OFFSETS\n",
+            "    if not audio_future.done():\n",
+            "        print('Waiting for the audio stage to finish...')\n",
+            "    voiceover_path, timestamps, SCENE_OFFSETS = audio_future.result()\n",
+            "    return voiceover_path, timestamps, SCENE_OFFSETS\n",
+            "\n",
+            "# Results land in voiceover_path / timestamps / SCENE_OFFSETS once a later cell calls wait_for_audio()\n",
+            "SCENE_OFFSETS = None\n",
+            "PIPELINE_START = time.time()\n",
+            "audio_future = stage_pool.submit(timed_stage, 'audio', run_audio_stage)\n",
+            "print('Audio stage started in the background. Run the B-roll cell now; it fetches footage while the voiceover renders.')"
         ]
     }
     
@@ -179,42 +439,517 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
         "outputs": [],
         "source": [
             "# 5. Fetch Pexels B-Roll Videos\n",
+            "SCREEN_CANDIDATES = True  # Show a thumbnail contact sheet of each scene's ranked candidates before any video download\n",
+            "SCENE_CHOICES = {}        # Pin picks from the sheet and re-run, e.g. {3: 2} -> scene 3 uses candidate [2]\n",
+            "\n",
+            "import html\n",
+            "import time\n",
+            "import base64\n",
+            "import shutil\n",
+            "import hashlib\n",
+            "from io import BytesIO\n",
+            "from PIL import Image, ImageDraw\n",
+            "import sqlite3\n",
+            "import threading\n",
+            "from collections import defaultdict\n",
+            "from concurrent.futures import ThreadPoolExecutor\n",
+            "from requests.adapters import HTTPAdapter\n",
+            "\n",
+            "# One pooled session for every Pexels call, so TLS connections are reused across scenes\n",
+            "pexels_session = requests.Session()\n",
+            "pexels_session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16))\n",
+            "\n",
+            "class TokenBucket:\n",
+            "    \"\"\"Token bucket (same semantics as src/throttle.py): the Pexels request budget, re-synced from the\n",
+            "    X-Ratelimit-* response headers, and the optional download bandwidth cap in bytes/s.\"\"\"\n",
+            "    def __init__(self, rate, capacity):\n",
+            "        self.rate, self.capacity, self.tokens = rate, capacity, capacity\n",
+            "        self.updated = time.monotonic()\n",
+            "        self.paused_until = 0.0\n",
+            "        self.lock = threading.Lock()\n",
+            "\n",
+            "    def acquire(self, amount=1):\n",
+            "        \"\"\"Block until `amount` tokens are available; amounts larger than the bucket run into debt instead of waiting forever.\"\"\"\n",
+            "        while True:\n",
+            "            with self.lock:\n",
+            "                now = time.monotonic()\n",
+            "                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)\n",
+            "                self.updated = now\n",
+            "                if now >= self.paused_until and self.tokens >= min(amount, self.capacity):\n",
+            "                    self.tokens -= amount\n",
+            "                    return\n",
+            "                wait = max(self.paused_until - now, (min(amount, self.capacity) - self.tokens) / self.rate)\n",
+            "            time.sleep(min(wait, 1.0))\n",
+            "\n",
+            "    def sync(self, response):\n",
+            "        remaining = response.headers.get('X-Ratelimit-Remaining')\n",
+            "        reset = response.headers.get('X-Ratelimit-Reset')\n",
+            "        if remaining is None or reset is None:\n",
+            "            return\n",
+            "        with self.lock:\n",
+            "            self.tokens = min(self.tokens, int(remaining))\n",
+            "            if int(remaining) <= 0 or response.status_code == 429:\n",
+            "                self.paused_until = time.monotonic() + max(float(reset) - time.time(), 1)\n",
+            "\n",
+            "pexels_budget = TokenBucket(rate=200 / 3600, capacity=20)\n",
+            "\n",
+            "# Persistent search cache (same schema as src/search_cache.py), kept on Drive so reruns and swaps skip the API\n",
+            "SEARCH_DB_PATH = os.path.join(CACHE_ROOT, CONFIG.get('caching', {}).get('pexels_search_db', 'pexels_search.sqlite'))\n",
+            "SEARCH_TTL_SECONDS = CONFIG.get('caching', {}).get('pexels_search_ttl_hours', 72) * 3600\n",
+            "with sqlite3.connect(SEARCH_DB_PATH, timeout=30) as conn:\n",
+            "    conn.executescript(\"\"\"\n",
+            "        CREATE TABLE IF NOT EXISTS searches (query TEXT NOT NULL, orientation TEXT NOT NULL, size TEXT NOT NULL,\n",
+            "            per_page INTEGER NOT NULL, fetched_at REAL NOT NULL, videos TEXT NOT NULL,\n",
+            "            PRIMARY KEY (query, orientation, size, per_page));\n",
+            "        CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);\n",
+            "    \"\"\")\n",
+            "\n",
+            "def search_cache_get(key):\n",
+            "    with sqlite3.connect(SEARCH_DB_PATH, timeout=30) as conn:\n",
+            "        row = conn.execute('SELECT fetched_at, videos FROM searches WHERE query = ? AND orientation = ? AND size = ? AND per_page = ?', key).fetchone()\n",
+            "        hit = row is not None and time.time() - row[0] < SEARCH_TTL_SECONDS\n",
+            "        conn.execute('INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1', ('hits' if hit else 'misses',))\n",
+            "    return json.loads(row[1]) if hit else None\n",
+            "\n",
+            "def search_cache_put(key, videos):\n",
+            "    with sqlite3.connect(SEARCH_DB_PATH, timeout=30) as conn:\n",
+            "        conn.execute('INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?, ?)', (*key, time.time(), json.dumps(videos, separators=(',', ':'))))\n",
+            "\n",
+            "def search_cache_stats():\n",
+            "    with sqlite3.connect(SEARCH_DB_PATH, timeout=30) as conn:\n",
+            "        counts = dict(conn.execute('SELECT name, value FROM stats').fetchall())\n",
+            "    hits, misses = counts.get('hits', 0), counts.get('misses', 0)\n",
+            "    return hits, misses, hits / (hits + misses) if hits + misses else 0.0\n",
+            "\n",
+            "def pexels_search(query, orientation, size='medium', per_page=5):\n",
+            "    \"\"\"Search Pexels videos within the rate-limit budget; cached for SEARCH_TTL_SECONDS, retries once after a 429.\"\"\"\n",
+            "    query = ' '.join(query.lower().split())\n",
+            "    key = (query, orientation, size, per_page)\n",
+            "    cached = search_cache_get(key)\n",
+            "    if cached is not None:\n",
+            "        return cached\n",
+            "    params = {'query': query, 'orientation': orientation, 'size': size, 'per_page': per_page}\n",
+            "    for attempt in range(2):\n",
+            "        pexels_budget.acquire()\n",
+            "        # The key goes on API calls only, never to the CDN hosts that serve the clips and thumbnails\n",
+            "        response = pexels_session.get('https://api.pexels.com/videos/search', params=params,\n",
+            "                                      headers={'Authorization': PEXELS_API_KEY}, timeout=30)\n",
+            "        pexels_budget.sync(response)\n",
+            "        if response.status_code != 429:\n",
+            "            break\n",
+            "    if response.status_code != 200:\n",
+            "        print(f'  -> Pexels search failed for {query!r}: {response.status_code}')\n",
+            "        return []\n",
+            "    videos = response.json().get('videos', [])\n",
+            "    search_cache_put(key, videos)\n",
+            "    return videos\n",
+            "\n",
+            "def select_rendition(video_files, duration):\n",
+            "    \"\"\"Cheapest mp4 rendition that covers the target resolution at the target fps; else the least upscaled one.\"\"\"\n",
+            "    target_w, target_h = CONFIG['video_settings']['resolution']\n",
+            "    target_fps = CONFIG['video_settings']['fps']\n",
+            "    usable = [vf for vf in video_files if vf.get('width') and vf.get('height') and vf.get('link')\n",
+            "              and vf.get('file_type', 'video/mp4') == 'video/mp4']\n",
+            "    if not usable:\n",
+            "        return video_files[0] if video_files else None\n",
+            "    def est_bytes(vf):\n",
+            "        # Pexels' size when present, otherwise pixels x fps x duration at ~0.1 bits per pixel\n",
+            "        return vf.get('size') or vf['width'] * vf['height'] * (vf.get('fps') or 30) * max(duration, 1) * 0.1 / 8\n",
+            "    def score(vf):\n",
+            "        upscale = max(target_w / vf['width'], target_h / vf['height'])\n",
+            "        smooth = (vf.get('fps') or target_fps) >= target_fps * 0.95\n",
+            "        return (0, not smooth, est_bytes(vf)) if upscale <= 1.0 else (1, upscale, not smooth)\n",
+            "    best = min(usable, key=score)\n",
+            "    return best | {'est_bytes': est_bytes(best)}\n",
+            "\n",
+            "def video_candidates(videos, min_duration):\n",
+            "    \"\"\"(too_short, est_bytes, video, rendition) for each usable result, best first: long enough for the scene, then cheapest.\"\"\"\n",
+            "    candidates = []\n",
+            "    for video in videos:\n",
+            "        rendition = select_rendition(video.get('video_files', []), video.get('duration', 0))\n",
+            "        if rendition:\n",
+            "            candidates.append((video.get('duration', 0) < min_duration, rendition.get('est_bytes', float('inf')), video, rendition))\n",
+            "    return sorted(candidates, key=lambda c: c[:2])\n",
+            "\n",
+            "def select_video(videos, min_duration):\n",
+            "    \"\"\"(video, rendition) that is long enough for the scene, picked at random among the near-cheapest downloads.\"\"\"\n",
+            "    candidates = video_candidates(videos, min_duration)\n",
+            "    if not candidates:\n",
+            "        return None, None\n",
+            "    too_short, best = candidates[0][:2]\n",
+            "    _, _, video, rendition = random.choice([c for c in candidates if c[0] == too_short and c[1] <= best * 2])\n",
+            "    return video, rendition\n",
+            "\n",
+            "def current_scene_offsets():\n",
+            "    \"\"\"Real scene timings once the audio stage has finished, else estimates from the script while it still runs.\"\"\"\n",
+            "    if globals().get('SCENE_OFFSETS'):\n",
+            "        return SCENE_OFFSETS\n",
+            "    future = globals().get('audio_future')\n",
+            "    if future is not None and future.done() and not future.exception():\n",
+            "        return future.result()[2]\n",
+            "    # ~2.2 words/s is slower than Kokoro speaks, so estimated heads rarely come up short\n",
+            "    padding = CONFIG['pacing_and_editing']['padding_between_sentences_seconds']\n",
+            "    offsets, cursor = [], 0.0\n",
+            "    for i, scene in enumerate(SCENES):\n",
+            "        duration = len(scene['text'].split()) / 2.2 + 0.5\n",
+            "        offsets.append({'scene': i, 'start': cursor, 'end': cursor + duration})\n",
+            "        cursor += duration + padding\n",
+            "    return offsets\n",
+            "\n",
+            "def scene_length(i):\n",
+            "    \"\"\"Seconds of footage scene i needs (from the voiceover timing, else the configured B-roll duration).\"\"\"\n",
+            "    offsets = {o['scene']: o for o in current_scene_offsets()}\n",
+            "    if i in offsets:\n",
+            "        return offsets[i]['end'] - offsets[i]['start']\n",
+            "    return CONFIG['pacing_and_editing']['b_roll_duration_seconds']\n",
+            "\n",
+            "# Downloader: 1 MB writes into .part files, HTTP Range resume, size check, then an atomic rename\n",
+            "DOWNLOAD_SETTINGS = {'max_parallel': 4, 'max_connections': 8, 'max_bandwidth_mbps': 0, 'retries': 3,\n",
+            "                     'head_only': True, 'head_margin_seconds': 2, **CONFIG.get('downloads', {})}\n",
+            "download_slots = threading.BoundedSemaphore(DOWNLOAD_SETTINGS['max_connections'])\n",
+            "_mbps = DOWNLOAD_SETTINGS['max_bandwidth_mbps']\n",
+            "download_bandwidth = TokenBucket(rate=_mbps * 125_000, capacity=_mbps * 125_000) if _mbps else None\n",
+            "\n",
+            "def _discard_part(part_path):\n",
+            "    for path in (part_path, part_path + '.json'):\n",
+            "        if os.path.exists(path):\n",
+            "            os.remove(path)\n",
+            "\n",
+            "def _fetch_part(url, part_path):\n",
+            "    # A sidecar records which URL / ETag / size the part belongs to, so a part from another URL is never spliced onto\n",
+            "    meta_path = part_path + '.json'\n",
+            "    meta = {}\n",
+            "    if os.path.exists(meta_path):\n",
+            "        with open(meta_path) as f:\n",
+            "            meta = json.load(f)\n",
+            "    if os.path.exists(part_path) and meta.get('url') != url:\n",
+            "        _discard_part(part_path)\n",
+            "        meta = {}\n",
+            "    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0\n",
+            "    headers = {'Range': f'bytes={offset}-'} if offset else {}\n",
+            "    if offset and meta.get('etag'):\n",
+            "        headers['If-Range'] = meta['etag']\n",
+            "    with download_slots, pexels_session.get(url, headers=headers, stream=True, timeout=(10, 60)) as r:\n",
+            "        total = r.headers.get('Content-Range', '').rpartition('/')[2]\n",
+            "        total = int(total) if total.isdigit() else -1\n",
+            "        if offset and r.status_code in (206, 416) and meta.get('length', -1) not in (-1, total):\n",
+            "            _discard_part(part_path)\n",
+            "            raise IOError('remote file changed size since the partial download')\n",
+            "        if r.status_code == 416 and offset:\n",
+            "            return total if total >= 0 else offset\n",
+            "        r.raise_for_status()\n",
+            "        if r.status_code == 206:\n",
+            "            mode, etag = 'ab', r.headers.get('ETag') or meta.get('etag')\n",
+            "        else:\n",
+            "            length = r.headers.get('Content-Length')\n",
+            "            total, mode = (int(length) if length and not r.headers.get('Content-Encoding') else -1), 'wb'\n",
+            "            etag = r.headers.get('ETag')\n",
+            "        with open(meta_path, 'w') as f:\n",
+            "            json.dump({'url': url, 'etag': etag, 'length': total}, f)\n",
+            "        with open(part_path, mode) as f:\n",
+            "            for chunk in r.iter_content(chunk_size=1024 * 1024):\n",
+            "                if download_bandwidth:\n",
+            "                    download_bandwidth.acquire(len(chunk))\n",
+            "                f.write(chunk)\n",
+            "    return total\n",
+            "\n",
+            "def download_file(url, out_path):\n",
+            "    \"\"\"Resumable download; returns out_path, or None after DOWNLOAD_SETTINGS['retries'] failed attempts.\"\"\"\n",
+            "    if os.path.exists(out_path):\n",
+            "        return out_path\n",
+            "    part_path = out_path + '.part'\n",
+            "    for attempt in range(DOWNLOAD_SETTINGS['retries'] + 1):\n",
+            "        try:\n",
+            "            total = _fetch_part(url, part_path)\n",
+            "            size = os.path.getsize(part_path)\n",
+            "            if total >= 0 and size != total:\n",
+            "                if size > total:\n",
+            "                    _discard_part(part_path)\n",
+            "                raise IOError(f'expected {total} bytes, got {size}')\n",
+            "            os.replace(part_path, out_path)\n",
+            "            os.remove(part_path + '.json')\n",
+            "            return out_path\n",
+            "        except (requests.RequestException, IOError) as e:\n",
+            "            status = e.response.status_code if isinstance(e, requests.HTTPError) and e.response is not None else None\n",
+            "            if status and 400 <= status < 500 and status not in (408, 429):\n",
+            "                print(f'  -> Download failed with HTTP {status}; not retrying.')\n",
+            "                return None\n",
+            "            if attempt == DOWNLOAD_SETTINGS['retries']:\n",
+            "                break\n",
+            "            print(f'  -> Download interrupted ({e}); resuming...')\n",
+            "            time.sleep(2 ** attempt)\n",
+            "    return None\n",
+            "\n",
+            "def fetch_head(url, out_path, seconds, source_duration=None):\n",
+            "    \"\"\"Fetch just the first `seconds` (+ margin) of a clip: ffmpeg pulls the index and the packets it needs via HTTP\n",
+            "    Range and stream-copies them into a trimmed mp4. Falls back to a full download if ranges are unsupported or it comes out short.\"\"\"\n",
+            "    if os.path.exists(out_path):\n",
+            "        return out_path\n",
+            "    required = min(seconds, source_duration) if source_duration else seconds\n",
+            "    part_path = out_path + '.head.part'\n",
+            "    try:\n",
+            "        with download_slots:\n",
+            "            with pexels_session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=(10, 30)) as r:\n",
+            "                ranged = r.status_code == 206\n",
+            "            if ranged:\n",
+            "                (ffmpeg.input(url, t=seconds + DOWNLOAD_SETTINGS['head_margin_seconds']).video\n",
+            "                    .output(part_path, format='mp4', vcodec='copy', movflags='+faststart')\n",
+            "                    .overwrite_output().run(capture_stdout=True, capture_stderr=True))\n",
+            "        if ranged and float(ffmpeg.probe(part_path)['format']['duration']) >= required - 0.1:\n",
+            "            os.replace(part_path, out_path)\n",
+            "            return out_path\n",
+            "    except (requests.RequestException, ffmpeg.Error, KeyError, ValueError) as e:\n",
+            "        print(f'  -> Head-only fetch failed ({e.__class__.__name__}); downloading the full clip.')\n",
+            "    if os.path.exists(part_path):\n",
+            "        os.remove(part_path)\n",
+            "    return download_file(url, out_path)\n",
+            "\n",
+            "def fetch_seconds(i):\n",
+            "    \"\"\"Footage to fetch for scene i: the span the preview cell trims to (up to the next scene's start).\"\"\"\n",
+            "    offsets = current_scene_offsets()\n",
+            "    if i + 1 < len(offsets):\n",
+            "        return max(scene_length(i), offsets[i + 1]['start'] - offsets[i]['start'])\n",
+            "    return scene_length(i)\n",
+            "\n",
+            "# Shared asset store (same layout as src/asset_store.py): one copy of each Pexels clip across every project\n",
+            "ASSET_DIR = os.path.join(CACHE_ROOT, 'assets')\n",
+            "ASSET_STAGING_DIR = os.path.join(ASSET_DIR, 'staging')\n",
+            "ASSET_DB_PATH = os.path.join(ASSET_DIR, 'index.sqlite')\n",
+            "ASSET_MAX_BYTES = CONFIG.get('caching', {}).get('asset_store_max_mb', 8192) * 1024 * 1024\n",
+            "os.makedirs(ASSET_STAGING_DIR, exist_ok=True)\n",
+            "with sqlite3.connect(ASSET_DB_PATH, timeout=30) as conn:\n",
+            "    conn.execute(\"\"\"CREATE TABLE IF NOT EXISTS assets (video_id INTEGER NOT NULL, file_id INTEGER NOT NULL, seconds REAL NOT NULL,\n",
+            "        filename TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (video_id, file_id, seconds))\"\"\")\n",
+            "asset_locks = defaultdict(threading.Lock)\n",
+            "# Clips used this recently are never evicted, so a path handed out by ensure_asset survives until it is linked\n",
+            "ASSET_GRACE_SECONDS = 600\n",
+            "\n",
+            "def asset_lookup(video_id, file_id, seconds):\n",
+            "    \"\"\"Stored clip covering the request (a long enough head, else the full file), or None.\"\"\"\n",
+            "    with sqlite3.connect(ASSET_DB_PATH, timeout=30) as conn:\n",
+            "        rows = conn.execute('SELECT seconds, filename FROM assets WHERE video_id = ? AND file_id = ? AND (seconds = 0 OR seconds >= ?) '\n",
+            "                            'ORDER BY seconds = 0, seconds', (video_id, file_id, seconds or float('inf'))).fetchall()\n",
+            "        for stored_seconds, filename in rows:\n",
+            "            key = (video_id, file_id, stored_seconds)\n",
+            "            if os.path.exists(os.path.join(ASSET_DIR, filename)):\n",
+            "                conn.execute('UPDATE assets SET last_used = ? WHERE video_id = ? AND file_id = ? AND seconds = ?', (time.time(), *key))\n",
+            "                return os.path.join(ASSET_DIR, filename)\n",
+            "            conn.execute('DELETE FROM assets WHERE video_id = ? AND file_id = ? AND seconds = ?', key)\n",
+            "    return None\n",
+            "\n",
+            "def asset_filename(video_id, file_id, seconds):\n",
+            "    return f\"{video_id}_{file_id}{f'_head{seconds:g}' if seconds else ''}.mp4\"\n",
+            "\n",
+            "def asset_add(video_id, file_id, seconds, staged_path):\n",
+            "    filename = asset_filename(video_id, file_id, seconds)\n",
+            "    os.replace(staged_path, os.path.join(ASSET_DIR, filename))\n",
+            "    with sqlite3.connect(ASSET_DB_PATH, timeout=30) as conn:\n",
+            "        conn.execute('INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)',\n",
+            "                     (video_id, file_id, seconds, filename, os.path.getsize(os.path.join(ASSET_DIR, filename)), time.time()))\n",
+            "        # LRU eviction down to the disk budget, sparing anything inside the grace window\n",
+            "        rows = conn.execute('SELECT video_id, file_id, seconds, filename, size, last_used FROM assets ORDER BY last_used').fetchall()\n",
+            "        total = sum(r[4] for r in rows)\n",
+            "        for vid, fid, secs, name, size, last_used in rows:\n",
+            "            if total <= ASSET_MAX_BYTES or last_used >= time.time() - ASSET_GRACE_SECONDS:\n",
+            "                break\n",
+            "            try:\n",
+            "                os.remove(os.path.join(ASSET_DIR, name))\n",
+            "            except FileNotFoundError:\n",
+            "                pass\n",
+            "            conn.execute('DELETE FROM assets WHERE video_id = ? AND file_id = ? AND seconds = ?', (vid, fid, secs))\n",
+            "            total -= size\n",
+            "    return os.path.join(ASSET_DIR, filename)\n",
+            "\n",
+            "def link_asset(store_path, out_path):\n",
+            "    \"\"\"Hardlink into the project; Drive cannot hardlink, so fall back to a copy.\"\"\"\n",
+            "    if os.path.exists(out_path):\n",
+            "        os.remove(out_path)\n",
+            "    try:\n",
+            "        os.link(store_path, out_path)\n",
+            "    except OSError:\n",
+            "        shutil.copyfile(store_path, out_path)\n",
+            "    return out_path\n",
+            "\n",
+            "def ensure_asset(video, rendition, i, out_path=None):\n",
+            "    \"\"\"Asset store path for the clip, downloading it (head-only when enabled) on a miss. None if the download failed.\n",
+            "    With out_path, the clip is also linked into the project while the key is still locked.\"\"\"\n",
+            "    key = (video['id'], rendition['id'])\n",
+            "    seconds = fetch_seconds(i) if DOWNLOAD_SETTINGS['head_only'] else 0\n",
+            "    with asset_locks[key]:\n",
+            "        stored = asset_lookup(*key, seconds)\n",
+            "        if not stored:\n",
+            "            staged = os.path.join(ASSET_STAGING_DIR, asset_filename(*key, seconds))\n",
+            "            if seconds:\n",
+            "                staged = fetch_head(rendition['link'], staged, seconds, video.get('duration'))\n",
+            "            else:\n",
+            "                staged = download_file(rendition['link'], staged)\n",
+            "            stored = asset_add(*key, seconds, staged) if staged else None\n",
+            "        if stored and out_path:\n",
+            "            return link_asset(stored, out_path)\n",
+            "    return stored\n",
+            "\n",
+            "def fetch_clip(video, rendition, out_path, i):\n",
+            "    \"\"\"Serve the clip from the asset store into the project, downloading it on a miss.\"\"\"\n",
+            "    return ensure_asset(video, rendition, i, out_path)\n",
+            "\n",
+            "# Swap candidates: a ranked pool of alternatives per scene, prefetched in the background while the carousel is reviewed\n",
+            "SWAP_CANDIDATES = CONFIG.get('downloads', {}).get('swap_candidates', 3)\n",
+            "if 'prefetch_pool' in globals():\n",
+            "    prefetch_pool.shutdown(wait=False, cancel_futures=True)\n",
+            "# Two workers so prefetching never competes hard with the preview renders\n",
+            "prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')\n",
+            "scene_candidates = {}\n",
+            "\n",
+            "def queue_candidates(i, videos, current=None):\n",
+            "    \"\"\"Rank the search results for scene i and start prefetching the top SWAP_CANDIDATES (skipping the clip in use).\"\"\"\n",
+            "    ranked = [(v, r) for _, _, v, r in video_candidates(videos, scene_length(i))\n",
+            "              if not current or v['id'] != current['id']][:SWAP_CANDIDATES]\n",
+            "    scene_candidates[i] = [{'video': v, 'rendition': r, 'future': prefetch_pool.submit(ensure_asset, v, r, i)} for v, r in ranked]\n",
+            "    return scene_candidates[i]\n",
+            "\n",
+            "def candidate_status(c):\n",
+            "    if not c['future'].done():\n",
+            "        return 'downloading'\n",
+            "    return 'ready' if c['future'].result() else 'failed'\n",
+            "\n",
+            "# Candidate screening: thumbnails only (Pexels video_pictures / poster), cached on disk, fetched concurrently\n",
+            "THUMB_DIR = os.path.join(CACHE_ROOT, 'thumbnails')\n",
+            "os.makedirs(THUMB_DIR, exist_ok=True)\n",
+            "SCREEN_TOP_N = 5\n",
+            "\n",
+            "def thumbnail_urls(video, frames=3):\n",
+            "    \"\"\"Up to `frames` stills spread across the clip, falling back to the poster image.\"\"\"\n",
+            "    pictures = [p['picture'] for p in sorted(video.get('video_pictures', []), key=lambda p: p.get('nr', 0)) if p.get('picture')]\n",
+            "    if len(pictures) > frames:\n",
+            "        pictures = [pictures[int(n * len(pictures) / frames)] for n in range(frames)]\n",
+            "    return pictures or ([video['image']] if video.get('image') else [])\n",
+            "\n",
+            "def fetch_thumbnail(url):\n",
+            "    path = os.path.join(THUMB_DIR, hashlib.sha256(url.encode()).hexdigest() + '.jpg')\n",
+            "    if not os.path.exists(path):\n",
+            "        try:\n",
+            "            r = pexels_session.get(url, timeout=15)\n",
+            "            r.raise_for_status()\n",
+            "        except requests.RequestException:\n",
+            "            return None\n",
+            "        with open(path + '.part', 'wb') as f:\n",
+            "            f.write(r.content)\n",
+            "        os.replace(path + '.part', path)\n",
+            "    return path\n",
+            "\n",
+            "def contact_strip(candidates, thumbs, picked=None, height=90):\n",
+            "    \"\"\"One small JPEG per scene: each candidate's frames side by side, labelled [n]; the auto pick gets a yellow bar.\"\"\"\n",
+            "    tiles = []\n",
+            "    for n, (video, rendition) in enumerate(candidates):\n",
+            "        frames = [Image.open(thumbs[u]).convert('RGB') for u in thumbnail_urls(video) if thumbs.get(u)]\n",
+            "        frames = [im.resize((max(1, im.width * height // im.height), height)) for im in frames]\n",
+            "        tile = Image.new('RGB', (max(sum(im.width for im in frames), 120), height + 18), (34, 34, 34))\n",
+            "        x = 0\n",
+            "        for im in frames:\n",
+            "            tile.paste(im, (x, 0))\n",
+            "            x += im.width\n",
+            "        label = f\"[{n}] {video.get('duration')}s {rendition.get('width')}x{rendition.get('height')}\"\n",
+            "        ImageDraw.Draw(tile).text((4, height + 3), label, fill=(255, 221, 0) if video is picked else (230, 230, 230))\n",
+            "        tiles.append(tile)\n",
+            "    strip = Image.new('RGB', (sum(t.width + 8 for t in tiles) or 1, height + 18), (17, 17, 17))\n",
+            "    x = 0\n",
+            "    for t in tiles:\n",
+            "        strip.paste(t, (x, 0))\n",
+            "        x += t.width + 8\n",
+            "    buf = BytesIO()\n",
+            "    strip.save(buf, format='JPEG', quality=70)\n",
+            "    return base64.b64encode(buf.getvalue()).decode()\n",
+            "\n",
+            "def show_contact_sheet(queries, ranked, picks):\n",
+            "    urls = [u for scene in ranked for video, _ in scene for u in thumbnail_urls(video)]\n",
+            "    with ThreadPoolExecutor(max_workers=16) as pool:\n",
+            "        thumbs = dict(zip(urls, pool.map(fetch_thumbnail, urls)))\n",
+            "    print(f'Screened {sum(len(scene) for scene in ranked)} candidates from {len(urls)} thumbnails (no video downloaded yet).')\n",
+            "    rows = ''.join(\n",
+            "        f\"<div style='margin:6px 0'><b>Scene {i}: {html.escape(query or '')}</b><br>\"\n",
+            "        f\"<img src='data:image/jpeg;base64,{contact_strip(scene, thumbs, picks.get(i))}'></div>\"\n",
+            "        for i, (query, scene) in enumerate(zip(queries, ranked)) if scene\n",
+            "    )\n",
+            "    display(HTML(f\"<div style='font-family:sans-serif'>{rows}<p>Pin a different candidate with SCENE_CHOICES = {{scene: n}} and re-run this cell (searches are cached).</p></div>\"))\n",
+            "\n",
             "def fetch_pexels_broll():\n",
-            "    headers = {'Authorization': PEXELS_API_KEY}\n",
             "    res = CONFIG['video_settings']['resolution']\n",
             "    orientation = 'landscape' if res[0] > res[1] else 'portrait'\n",
             "    \n",
-            "    b_roll_paths = []\n",
-            "    for i, scene in enumerate(SCENES):\n",
-            "        query = scene.get('visual_query')\n",
+            "    # Search every scene concurrently; results come back in scene order\n",
+            "    queries = [scene.get('visual_query') for scene in SCENES]\n",
+            "    print(f'Searching Pexels for {len(queries)} {orientation} visuals...')\n",
+            "    with ThreadPoolExecutor(max_workers=8) as pool:\n",
+            "        search_results = list(pool.map(lambda q: pexels_search(q, orientation) if q else [], queries))\n",
+            "    hits, misses, ratio = search_cache_stats()\n",
+            "    print(f'Search cache hit ratio: {ratio:.0%} ({hits} hits, {misses} misses)')\n",
+            "    \n",
+            "    # Rank every scene's results up front; picks come from the pinned choice or the usual randomized cheapest pick\n",
+            "    ranked = [[(v, r) for _, _, v, r in video_candidates(videos, scene_length(i))][:SCREEN_TOP_N]\n",
+            "              for i, videos in enumerate(search_results)]\n",
+            "    picks = {}\n",
+            "    for i, videos in enumerate(search_results):\n",
+            "        if i in SCENE_CHOICES and SCENE_CHOICES[i] < len(ranked[i]):\n",
+            "            picks[i] = ranked[i][SCENE_CHOICES[i]]\n",
+            "        elif videos:\n",
+            "            picks[i] = select_video(videos, scene_length(i))\n",
+            "    if SCREEN_CANDIDATES:\n",
+            "        show_contact_sheet(queries, ranked, {i: pick[0] for i, pick in picks.items()})\n",
+            "    \n",
+            "    jobs = []\n",
+            "    for i, (query, videos) in enumerate(zip(queries, search_results)):\n",
             "        if not query: continue\n",
             "        \n",
             "        print(f'Fetching {orientation} visual for: {query}')\n",
-            "        url = f'https://api.pexels.com/videos/search?query={query}&orientation={orientation}&size=medium&per_page=5'\n",
-            "        response = requests.get(url, headers=headers)\n",
-            "        videos = response.json().get('videos', [])\n",
-            "        \n",
             "        if not videos:\n",
             "            print(f'  -> No videos found.')\n",
             "            continue\n",
             "            \n",
-            "        video = random.choice(videos)\n",
-            "        video_files = video.get('video_files', [])\n",
-            "        best_file = next((vf for vf in video_files if vf.get('quality') == 'hd'), video_files[0] if video_files else None)\n",
+            "        video, best_file = picks[i]\n",
             "        \n",
             "        if best_file:\n",
-            "            b_roll_path = os.path.join(PROJECT_DIR, f'scene_{i}.mp4')\n",
-            "            r = requests.get(best_file['link'], stream=True)\n",
-            "            with open(b_roll_path, 'wb') as f:\n",
-            "                for chunk in r.iter_content(chunk_size=1024):\n",
-            "                    if chunk: f.write(chunk)\n",
-            "            b_roll_paths.append(b_roll_path)\n",
+            "            print(f\"  -> {best_file.get('width')}x{best_file.get('height')} @ {best_file.get('fps')} fps, {video.get('duration')}s clip\")\n",
+            "            jobs.append((i, video, best_file, os.path.join(PROJECT_DIR, f'scene_{i}.mp4')))\n",
+            "            fetched_seconds[i] = fetch_seconds(i)\n",
+            "            scene_picks[i] = video\n",
+            "    \n",
+            "    print(f'Downloading {len(jobs)} clips ({DOWNLOAD_SETTINGS[\"max_parallel\"]} at a time)...')\n",
+            "    with ThreadPoolExecutor(max_workers=DOWNLOAD_SETTINGS['max_parallel']) as pool:\n",
+            "        results = list(pool.map(lambda job: fetch_clip(job[1], job[2], job[3], job[0]), jobs))\n",
+            "    b_roll_paths = []\n",
+            "    for (i, *_), path in zip(jobs, results):\n",
+            "        if path:\n",
+            "            b_roll_paths.append(path)\n",
             "            print(f'  -> Downloaded scene_{i}')\n",
-            "    return b_roll_paths\n",
+            "        else:\n",
+            "            print(f'  -> Failed to download scene_{i}')\n",
+            "    return b_roll_paths, jobs, search_results\n",
             "\n",
-            "b_roll_paths = fetch_pexels_broll()\n",
+            "def top_up_short_heads(jobs):\n",
+            "    \"\"\"Heads sized from estimated scene lengths are re-fetched if the real voiceover timing turned out longer.\"\"\"\n",
+            "    short = [job for job in jobs if DOWNLOAD_SETTINGS['head_only'] and fetch_seconds(job[0]) > fetched_seconds.get(job[0], 0)]\n",
+            "    if short:\n",
+            "        print(f'Re-fetching {len(short)} clips whose scenes ran longer than estimated...')\n",
+            "        with ThreadPoolExecutor(max_workers=DOWNLOAD_SETTINGS['max_parallel']) as pool:\n",
+            "            list(pool.map(lambda job: fetch_clip(job[1], job[2], job[3], job[0]), short))\n",
+            "\n",
+            "scene_picks = {}\n",
+            "fetched_seconds = {}\n",
+            "b_roll_paths, broll_jobs, broll_search_results = timed_stage('b-roll', fetch_pexels_broll)\n",
             "if not b_roll_paths:\n",
-            "    print('ERROR: Failed to download any B-roll videos. Cannot proceed.')"
+            "    print('ERROR: Failed to download any B-roll videos. Cannot proceed.')\n",
+            "\n",
+            "# Join the audio stage started by cell 4\n",
+            "if 'audio_future' in globals():\n",
+            "    wait_for_audio()\n",
+            "    report_critical_path(['load kokoro', 'load whisper', 'audio', 'b-roll'], PIPELINE_START)\n",
+            "    top_up_short_heads(broll_jobs)\n",
+            "\n",
+            "# Start filling the swap pools; this keeps running after the cell finishes\n",
+            "for i, videos in enumerate(broll_search_results):\n",
+            "    if videos:\n",
+            "        queue_candidates(i, videos, scene_picks.get(i))\n",
+            "print(f'Prefetching up to {SWAP_CANDIDATES} swap candidates per scene in the background.')"
         ]
     }
     
@@ -228,15 +963,33 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "# 6. Render Scene Previews (FFmpeg — clean video, captions as VTT)\n",
             "import time\n",
             "import base64\n",
+            "import threading\n",
+            "from concurrent.futures import ThreadPoolExecutor, as_completed\n",
             "render_start = time.time()\n",
             "\n",
             "target_w, target_h = CONFIG['video_settings']['resolution']\n",
             "fps = CONFIG['video_settings']['fps']\n",
             "\n",
+            "# Bounded pool of concurrent ffmpeg processes; each gets an equal share of the cores\n",
+            "RENDER_WORKERS = max(1, min(len(SCENES), os.cpu_count() or 1))\n",
+            "FFMPEG_THREADS = max(1, (os.cpu_count() or 1) // RENDER_WORKERS)\n",
+            "\n",
+            "# The audio stage may still be running if cell 5 was skipped or re-run; the previews need its outputs\n",
+            "wait_for_audio()\n",
+            "\n",
             "# Get total audio duration using ffprobe\n",
             "probe = ffmpeg.probe(voiceover_path)\n",
             "total_audio_duration = float(probe['format']['duration'])\n",
-            "scene_duration = total_audio_duration / len(SCENES)\n",
+            "\n",
+            "def scene_bounds(scene_idx):\n",
+            "    \"\"\"(start, end) of a scene in the voiceover: from its synthesized start to the next scene's start, so the\n",
+            "    padding between scenes stays with the scene it follows. Even split if the audio cell gave no offsets.\"\"\"\n",
+            "    offsets = globals().get('SCENE_OFFSETS') or []\n",
+            "    if len(offsets) != len(SCENES):\n",
+            "        even = total_audio_duration / len(SCENES)\n",
+            "        return scene_idx * even, min((scene_idx + 1) * even, total_audio_duration)\n",
+            "    end = offsets[scene_idx + 1]['start'] if scene_idx + 1 < len(offsets) else total_audio_duration\n",
+            "    return offsets[scene_idx]['start'], end\n",
             "\n",
             "def group_words_into_phrases(words, max_words=10):\n",
             "    \"\"\"Group words based on punctuation or a max word limit.\"\"\"\n",
@@ -284,8 +1037,7 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "\n",
             "def get_scene_phrases(scene_idx):\n",
             "    \"\"\"Get grouped phrases for a specific scene, with times relative to scene start.\"\"\"\n",
-            "    scene_start = scene_idx * scene_duration\n",
-            "    scene_end = min((scene_idx + 1) * scene_duration, total_audio_duration)\n",
+            "    scene_start, scene_end = scene_bounds(scene_idx)\n",
             "    scene_words = []\n",
             "    for w in timestamps:\n",
             "        if w['start'] >= scene_start and w['end'] <= scene_end:\n",
@@ -296,69 +1048,247 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "            })\n",
             "    return group_words_into_phrases(scene_words)\n",
             "\n",
-            "def render_scene_preview(scene_idx):\n",
+            "import hashlib\n",
+            "PROXY_DIR = os.path.join(CACHE_ROOT, 'broll_proxies')\n",
+            "os.makedirs(PROXY_DIR, exist_ok=True)\n",
+            "PROXY_MAX_BYTES = CONFIG.get('caching', {}).get('broll_proxy_max_mb', 4096) * 1024 * 1024\n",
+            "\n",
+            "def file_sha256(path):\n",
+            "    digest = hashlib.sha256()\n",
+            "    with open(path, 'rb') as f:\n",
+            "        for chunk in iter(lambda: f.read(1024 * 1024), b''):\n",
+            "            digest.update(chunk)\n",
+            "    return digest.hexdigest()\n",
+            "\n",
+            "def prune_broll_proxies(keep=()):\n",
+            "    \"\"\"Evict least-recently-used proxies until the cache fits its size budget, never touching those in `keep`.\"\"\"\n",
+            "    keep = set(keep)\n",
+            "    entries = []\n",
+            "    for name in os.listdir(PROXY_DIR):\n",
+            "        if name.endswith('.mp4'):\n",
+            "            try:\n",
+            "                st = os.stat(os.path.join(PROXY_DIR, name))\n",
+            "            except FileNotFoundError:\n",
+            "                continue\n",
+            "            entries.append((st.st_mtime, st.st_size, name))\n",
+            "    total = sum(e[1] for e in entries)\n",
+            "    for _, size, name in sorted(entries):\n",
+            "        if total <= PROXY_MAX_BYTES:\n",
+            "            break\n",
+            "        if os.path.join(PROXY_DIR, name) in keep:\n",
+            "            continue\n",
+            "        try:\n",
+            "            os.remove(os.path.join(PROXY_DIR, name))\n",
+            "        except FileNotFoundError:\n",
+            "            pass\n",
+            "        total -= size\n",
+            "\n",
+            "def get_broll_proxy(b_roll_file, duration, prune=True):\n",
+            "    \"\"\"Transcode a B-roll file once to target resolution/fps/pixel format; later renders only trim it.\n",
+            "    The parallel render below passes prune=False and prunes once after the pool, so no thread evicts another's proxy.\"\"\"\n",
+            "    key_src = json.dumps([file_sha256(b_roll_file), target_w, target_h, fps, round(duration, 3)])\n",
+            "    proxy_path = os.path.join(PROXY_DIR, hashlib.sha256(key_src.encode()).hexdigest() + '.mp4')\n",
+            "    if os.path.exists(proxy_path):\n",
+            "        os.utime(proxy_path)  # LRU touch\n",
+            "        return proxy_path\n",
+            "    part_path = f'{proxy_path}.{threading.get_ident()}.part'  # scenes may share a B-roll file\n",
+            "    video_stream = (\n",
+            "        ffmpeg.input(b_roll_file, t=duration).video\n",
+            "        .filter('scale', w=f'if(gt(iw/ih,{target_w}/{target_h}),{-2},{target_w})', h=f'if(gt(iw/ih,{target_w}/{target_h}),{target_h},{-2})')\n",
+            "        .filter('crop', target_w, target_h)\n",
+            "        .filter('setsar', 1)\n",
+            "        .filter('fps', fps)\n",
+            "    )\n",
+            "    try:\n",
+            "        (\n",
+            "            ffmpeg\n",
+            "            .output(video_stream, part_path, format='mp4', vcodec='libx264', pix_fmt='yuv420p',\n",
+            "                    crf=18, preset='veryfast', g=fps, movflags='+faststart')\n",
+            "            .overwrite_output()\n",
+            "            .run(quiet=True)\n",
+            "        )\n",
+            "    except ffmpeg.Error:\n",
+            "        if os.path.exists(part_path):\n",
+            "            os.remove(part_path)\n",
+            "        raise\n",
+            "    os.replace(part_path, proxy_path)\n",
+            "    if prune:\n",
+            "        prune_broll_proxies(keep=[proxy_path])\n",
+            "    return proxy_path\n",
+            "\n",
+            "# Preview cache: a scene is only re-encoded when one of its inputs changed\n",
+            "PREVIEW_ENCODER = {'vcodec': 'libx264', 'acodec': 'aac', 'b:v': '2M', 'preset': 'ultrafast'}\n",
+            "PREVIEW_MANIFEST_PATH = os.path.join(PROJECT_DIR, 'preview_manifest.json')\n",
+            "if os.path.exists(PREVIEW_MANIFEST_PATH):\n",
+            "    with open(PREVIEW_MANIFEST_PATH) as f:\n",
+            "        preview_manifest = json.load(f)\n",
+            "else:\n",
+            "    preview_manifest = {}\n",
+            "preview_cache_stats = {'hits': 0, 'misses': 0}\n",
+            "preview_lock = threading.Lock()\n",
+            "\n",
+            "def voiceover_slice_sha256(start, duration):\n",
+            "    \"\"\"Hash only the audio samples this scene plays, so edits elsewhere in the track don't invalidate it.\"\"\"\n",
+            "    sr = sf.info(voiceover_path).samplerate\n",
+            "    samples, _ = sf.read(voiceover_path, start=int(start * sr), stop=int((start + duration) * sr), dtype='int16')\n",
+            "    return hashlib.sha256(samples.tobytes()).hexdigest()\n",
+            "\n",
+            "def scene_fingerprint(b_roll_file, scene_start, actual_duration, phrases):\n",
+            "    return hashlib.sha256(json.dumps({\n",
+            "        'b_roll': file_sha256(b_roll_file),\n",
+            "        'audio': voiceover_slice_sha256(scene_start, actual_duration),\n",
+            "        'start': round(scene_start, 3),\n",
+            "        'duration': round(actual_duration, 3),\n",
+            "        'resolution': [target_w, target_h],\n",
+            "        'fps': fps,\n",
+            "        'encoder': PREVIEW_ENCODER,\n",
+            "        'phrases': phrases,\n",
+            "    }, sort_keys=True).encode()).hexdigest()\n",
+            "\n",
+            "scene_proxies = {}\n",
+            "\n",
+            "def render_scene_preview(scene_idx, prune_proxies=True):\n",
             "    \"\"\"Render a clean scene preview (no burned-in subtitles) + generate VTT.\"\"\"\n",
-            "    scene_start = scene_idx * scene_duration\n",
-            "    scene_end = min((scene_idx + 1) * scene_duration, total_audio_duration)\n",
+            "    scene_start, scene_end = scene_bounds(scene_idx)\n",
             "    actual_duration = scene_end - scene_start\n",
             "    \n",
             "    b_roll_file = b_roll_paths[scene_idx % len(b_roll_paths)]\n",
             "    preview_path = os.path.join(PROJECT_DIR, f'preview_scene_{scene_idx}.mp4')\n",
             "    vtt_path = os.path.join(PROJECT_DIR, f'subs_scene_{scene_idx}.vtt')\n",
             "    \n",
-            "    # Generate VTT captions for this scene\n",
             "    phrases = get_scene_phrases(scene_idx)\n",
+            "    fingerprint = scene_fingerprint(b_roll_file, scene_start, actual_duration, phrases)\n",
+            "    if preview_manifest.get(str(scene_idx)) == fingerprint and os.path.exists(preview_path) and os.path.exists(vtt_path):\n",
+            "        with preview_lock:\n",
+            "            preview_cache_stats['hits'] += 1\n",
+            "        return preview_path, vtt_path\n",
+            "    with preview_lock:\n",
+            "        preview_cache_stats['misses'] += 1\n",
+            "    \n",
+            "    # Generate VTT captions for this scene\n",
             "    generate_vtt(phrases, vtt_path)\n",
             "    \n",
-            "    # Build ffmpeg filter graph: scale -> crop (NO subtitle burn)\n",
-            "    video_in = ffmpeg.input(b_roll_file, t=actual_duration)\n",
+            "    # The proxy is already scaled/cropped, so the preview only trims it (NO subtitle burn)\n",
+            "    proxy_file = get_broll_proxy(b_roll_file, actual_duration, prune=prune_proxies)\n",
+            "    scene_proxies[scene_idx] = proxy_file\n",
+            "    video_in = ffmpeg.input(proxy_file, t=actual_duration)\n",
             "    audio_in = ffmpeg.input(voiceover_path, ss=scene_start, t=actual_duration)\n",
             "    \n",
-            "    video_stream = (\n",
-            "        video_in.video\n",
-            "        .filter('scale', w=f'if(gt(iw/ih,{target_w}/{target_h}),{-2},{target_w})', h=f'if(gt(iw/ih,{target_w}/{target_h}),{target_h},{-2})')\n",
-            "        .filter('crop', target_w, target_h)\n",
-            "    )\n",
+            "    video_stream = video_in.video\n",
             "    \n",
             "    (\n",
             "        ffmpeg\n",
             "        .output(video_stream, audio_in.audio, preview_path,\n",
-            "                vcodec='libx264', acodec='aac',\n",
-            "                movflags='+faststart', threads=4,\n",
-            "                **{'b:v': '2M', 'preset': 'ultrafast'})\n",
+            "                movflags='+faststart', threads=FFMPEG_THREADS,\n",
+            "                **PREVIEW_ENCODER)\n",
             "        .overwrite_output()\n",
             "        .run(quiet=True)\n",
             "    )\n",
+            "    with preview_lock:\n",
+            "        preview_manifest[str(scene_idx)] = fingerprint\n",
+            "        with open(PREVIEW_MANIFEST_PATH, 'w') as f:\n",
+            "            json.dump(preview_manifest, f, indent=2)\n",
             "    return preview_path, vtt_path\n",
             "\n",
-            "scene_previews = []\n",
-            "scene_vtts = []\n",
-            "for i in range(len(SCENES)):\n",
-            "    vid_path, vtt_path = render_scene_preview(i)\n",
-            "    scene_previews.append(vid_path)\n",
-            "    scene_vtts.append(vtt_path)\n",
-            "    query = SCENES[i].get('visual_query', 'N/A')\n",
-            "    print(f'Scene {i} rendered: {query}  ({scene_duration:.1f}s)')\n",
+            "scene_previews = [None] * len(SCENES)\n",
+            "scene_vtts = [None] * len(SCENES)\n",
+            "failed_scenes = {}\n",
+            "print(f'Rendering {len(SCENES)} scenes with {RENDER_WORKERS} parallel ffmpeg processes ({FFMPEG_THREADS} threads each)...')\n",
+            "with ThreadPoolExecutor(max_workers=RENDER_WORKERS) as pool:\n",
+            "    futures = {pool.submit(render_scene_preview, i, False): i for i in range(len(SCENES))}\n",
+            "    for future in as_completed(futures):\n",
+            "        i = futures[future]\n",
+            "        query = SCENES[i].get('visual_query', 'N/A')\n",
+            "        try:\n",
+            "            scene_previews[i], scene_vtts[i] = future.result()\n",
+            "            print(f'Scene {i} rendered: {query}  ({scene_bounds(i)[1] - scene_bounds(i)[0]:.1f}s)')\n",
+            "        except Exception as e:\n",
+            "            # Keep going; a failed scene can be fixed with Cell 7\n",
+            "            stderr = getattr(e, 'stderr', None)\n",
+            "            failed_scenes[i] = stderr.decode(errors='replace')[-500:] if stderr else str(e)\n",
+            "            print(f'Scene {i} FAILED: {query}')\n",
+            "# One prune after the pool: every proxy this run used is kept, the rest are evicted least-recently-used first\n",
+            "prune_broll_proxies(keep=scene_proxies.values())\n",
             "\n",
             "elapsed = time.time() - render_start\n",
-            "print(f'\\n=== All {len(scene_previews)} scene previews rendered in {elapsed:.1f}s! ===')\n",
+            "rendered_count = len(SCENES) - len(failed_scenes)\n",
+            "print(f'\\n=== {rendered_count}/{len(SCENES)} scene previews rendered in {elapsed:.1f}s! ===')\n",
+            "for i, err in sorted(failed_scenes.items()):\n",
+            "    print(f'  Scene {i} failed: {err}')\n",
+            "print(f\"Preview cache: {preview_cache_stats['hits']} reused, {preview_cache_stats['misses']} re-encoded\")\n",
             "print('Review each scene below. Toggle CC to preview captions.')\n",
             "print('If you want to swap a scene, use Cell 7.')\n",
             "print('When satisfied, run Cell 8 to stitch the final video.\\n')\n",
             "\n",
             "# Build interactive carousel with CC toggle\n",
-            "# Encode videos and VTTs as base64 for embedding\n",
+            "# 'lazy' keeps the notebook output tiny: only the scene list is embedded and each scene's poster,\n",
+            "# low-res proxy and (on request) full preview are fetched from the kernel when it is selected.\n",
+            "# 'embed' base64-inlines every full preview (works outside Colab, but output grows with scene count).\n",
+            "CAROUSEL_MODE = 'lazy'  # 'lazy' or 'embed'\n",
+            "try:\n",
+            "    from google.colab import output as colab_output\n",
+            "    from IPython.display import JSON\n",
+            "except ImportError:\n",
+            "    CAROUSEL_MODE = 'embed'\n",
+            "\n",
+            "def b64_file(path):\n",
+            "    with open(path, 'rb') as f:\n",
+            "        return base64.b64encode(f.read()).decode()\n",
+            "\n",
+            "def scene_poster(scene_idx):\n",
+            "    \"\"\"Small JPEG poster frame, regenerated whenever the preview is newer.\"\"\"\n",
+            "    src = scene_previews[scene_idx]\n",
+            "    poster_path = os.path.join(PROJECT_DIR, f'poster_scene_{scene_idx}.jpg')\n",
+            "    if not os.path.exists(poster_path) or os.path.getmtime(poster_path) < os.path.getmtime(src):\n",
+            "        (\n",
+            "            ffmpeg.input(src, ss=min(0.5, (scene_bounds(scene_idx)[1] - scene_bounds(scene_idx)[0]) / 2))\n",
+            "            .output(poster_path, vframes=1, vf='scale=320:-2', **{'q:v': 6})\n",
+            "            .overwrite_output()\n",
+            "            .run(quiet=True)\n",
+            "        )\n",
+            "    return poster_path\n",
+            "\n",
+            "def scene_proxy(scene_idx):\n",
+            "    \"\"\"Low-resolution, low-bitrate copy of the preview for quick scrubbing.\"\"\"\n",
+            "    src = scene_previews[scene_idx]\n",
+            "    proxy_path = os.path.join(PROJECT_DIR, f'preview_scene_{scene_idx}_proxy.mp4')\n",
+            "    if not os.path.exists(proxy_path) or os.path.getmtime(proxy_path) < os.path.getmtime(src):\n",
+            "        (\n",
+            "            ffmpeg.input(src)\n",
+            "            .output(proxy_path, vf='scale=if(gt(iw\\\\,ih)\\\\,-2\\\\,360):if(gt(iw\\\\,ih)\\\\,360\\\\,-2)',\n",
+            "                    vcodec='libx264', acodec='aac', movflags='+faststart',\n",
+            "                    **{'b:v': '300k', 'b:a': '64k', 'preset': 'ultrafast'})\n",
+            "            .overwrite_output()\n",
+            "            .run(quiet=True)\n",
+            "        )\n",
+            "    return proxy_path\n",
+            "\n",
+            "def scene_media(scene_idx, kind):\n",
+            "    \"\"\"Kernel callback for the lazy carousel: returns one asset for one scene as base64.\"\"\"\n",
+            "    scene_idx = int(scene_idx)\n",
+            "    if scene_previews[scene_idx] is None:\n",
+            "        return JSON({'error': f'Scene {scene_idx} has no preview'})\n",
+            "    if kind == 'poster':\n",
+            "        return JSON({'data': b64_file(scene_poster(scene_idx))})\n",
+            "    if kind == 'proxy':\n",
+            "        return JSON({'data': b64_file(scene_proxy(scene_idx)), 'captions': b64_file(scene_vtts[scene_idx])})\n",
+            "    return JSON({'data': b64_file(scene_previews[scene_idx]), 'captions': b64_file(scene_vtts[scene_idx])})\n",
+            "\n",
             "scenes_data = []\n",
             "for i in range(len(scene_previews)):\n",
-            "    with open(scene_previews[i], 'rb') as f:\n",
-            "        vid_b64 = base64.b64encode(f.read()).decode()\n",
-            "    with open(scene_vtts[i], 'rb') as f:\n",
-            "        vtt_b64 = base64.b64encode(f.read()).decode()\n",
+            "    if scene_previews[i] is None:\n",
+            "        continue\n",
             "    q = SCENES[i]['visual_query'].replace(chr(34), chr(39))\n",
-            "    scenes_data.append('{v:\"' + vid_b64 + '\",c:\"' + vtt_b64 + '\",q:\"' + q + '\"}')\n",
+            "    if CAROUSEL_MODE == 'embed':\n",
+            "        scenes_data.append('{i:' + str(i) + ',v:\"' + b64_file(scene_previews[i]) + '\",c:\"' + b64_file(scene_vtts[i]) + '\",q:\"' + q + '\"}')\n",
+            "    else:\n",
+            "        scenes_data.append('{i:' + str(i) + ',q:\"' + q + '\"}')\n",
+            "\n",
+            "if CAROUSEL_MODE == 'lazy':\n",
+            "    colab_output.register_callback('scene_media', scene_media)\n",
             "\n",
             "scenes_js = ','.join(scenes_data)\n",
-            "n = len(scene_previews)\n",
+            "n = len(scenes_data)\n",
             "\n",
             "html = '<div id=\"carousel\" style=\"text-align:center;background:#1a1a2e;padding:20px;border-radius:12px;max-width:640px;margin:auto\">'\n",
             "html += '<h3 id=\"scene-title\" style=\"color:#e0e0e0;margin:0 0 10px\">Scene 0</h3>'\n",
@@ -369,24 +1299,35 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "html += '<span id=\"counter\" style=\"color:#aaa;font-size:16px\">1 / ' + str(n) + '</span>'\n",
             "html += '<button onclick=\"nextScene()\" style=\"padding:10px 24px;font-size:18px;cursor:pointer;border:none;background:#0d7377;color:white;border-radius:8px\">Next \\u25b6</button>'\n",
             "html += '<button id=\"cc-btn\" onclick=\"toggleCC()\" style=\"padding:10px 18px;font-size:16px;cursor:pointer;border:none;background:#e67e22;color:white;border-radius:8px;font-weight:bold\">CC \\u2713</button>'\n",
+            "if CAROUSEL_MODE == 'lazy':\n",
+            "    html += '<button id=\"hq-btn\" onclick=\"loadFull()\" style=\"padding:10px 18px;font-size:16px;cursor:pointer;border:none;background:#555;color:white;border-radius:8px\">HQ</button>'\n",
             "html += '</div></div>'\n",
             "html += '<script>'\n",
             "html += 'var scenes=[' + scenes_js + '];'\n",
+            "html += 'var lazy=' + ('true' if CAROUSEL_MODE == 'lazy' else 'false') + ';'\n",
             "html += 'var cur=0;var ccOn=true;'\n",
-            "html += 'function showScene(i){'\n",
-            "html += 'cur=i;var v=document.getElementById(\"scene-video\");'\n",
-            "html += 'v.src=\"data:video/mp4;base64,\"+scenes[i].v;'\n",
+            "html += 'function setMedia(v,vid,cap){'\n",
+            "html += 'v.src=\"data:video/mp4;base64,\"+vid;'\n",
             "html += 'while(v.firstChild)v.removeChild(v.firstChild);'\n",
             "html += 'var t=document.createElement(\"track\");'\n",
             "html += 't.kind=\"subtitles\";t.label=\"English\";t.srclang=\"en\";'\n",
-            "html += 't.src=\"data:text/vtt;base64,\"+scenes[i].c;'\n",
+            "html += 't.src=\"data:text/vtt;base64,\"+cap;'\n",
             "html += 't.default=true;v.appendChild(t);'\n",
             "html += 'v.load();v.play();'\n",
             "html += 'setTimeout(function(){if(v.textTracks&&v.textTracks[0]){v.textTracks[0].mode=ccOn?\"showing\":\"hidden\";}},100);'\n",
-            "html += 'document.getElementById(\"scene-title\").innerText=\"Scene \"+i;'\n",
+            "html += '}'\n",
+            "html += 'function fetchMedia(i,kind){return google.colab.kernel.invokeFunction(\"scene_media\",[scenes[i].i,kind],{}).then(function(r){return r.data[\"application/json\"];});}'\n",
+            "html += 'function showScene(i){'\n",
+            "html += 'cur=i;var v=document.getElementById(\"scene-video\");'\n",
+            "html += 'document.getElementById(\"scene-title\").innerText=\"Scene \"+scenes[i].i;'\n",
             "html += 'document.getElementById(\"scene-query\").innerText=scenes[i].q;'\n",
             "html += 'document.getElementById(\"counter\").innerText=(i+1)+\" / \"+scenes.length;'\n",
+            "html += 'if(!lazy){setMedia(v,scenes[i].v,scenes[i].c);return;}'\n",
+            "html += 'v.removeAttribute(\"src\");v.poster=\"\";'\n",
+            "html += 'fetchMedia(i,\"poster\").then(function(m){if(cur===i&&m.data)v.poster=\"data:image/jpeg;base64,\"+m.data;});'\n",
+            "html += 'fetchMedia(i,\"proxy\").then(function(m){if(cur===i&&m.data)setMedia(v,m.data,m.captions);});'\n",
             "html += '}'\n",
+            "html += 'function loadFull(){var i=cur;fetchMedia(i,\"full\").then(function(m){if(cur===i&&m.data)setMedia(document.getElementById(\"scene-video\"),m.data,m.captions);});}'\n",
             "html += 'function prevScene(){if(cur>0)showScene(cur-1);}'\n",
             "html += 'function nextScene(){if(cur<scenes.length-1)showScene(cur+1);}'\n",
             "html += 'function toggleCC(){ccOn=!ccOn;var b=document.getElementById(\"cc-btn\");b.innerText=ccOn?\"CC \\u2713\":\"CC \\u2717\";b.style.background=ccOn?\"#e67e22\":\"#555\";var v=document.getElementById(\"scene-video\");if(v.textTracks&&v.textTracks[0]){v.textTracks[0].mode=ccOn?\"showing\":\"hidden\";}}'\n",
@@ -404,45 +1345,57 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
         "outputs": [],
         "source": [
             "# 7. Scene Swap Tool\n",
-            "# Change the scene number and search query below, then run this cell.\n",
-            "# Re-run as many times as you want to try different B-roll for any scene.\n",
+            "# Swap candidates were prefetched in the background after cell 5, so picking one of them is near-instant.\n",
+            "# Set SWAP_SCENE, then either SWAP_CANDIDATE (index in the list printed below) or SWAP_QUERY for a fresh search.\n",
             "\n",
-            "SWAP_SCENE = -1  # <-- Set to the scene number you want to replace (e.g., 3)\n",
-            "SWAP_QUERY = ''  # <-- Set to a new Pexels search query (e.g., 'ocean waves sunset')\n",
+            "SWAP_SCENE = -1      # <-- Set to the scene number you want to replace (e.g., 3)\n",
+            "SWAP_CANDIDATE = 0   # <-- Index into that scene's prefetched candidates\n",
+            "SWAP_QUERY = ''      # <-- Optional: a new Pexels search query instead (e.g., 'ocean waves sunset')\n",
             "\n",
-            "if SWAP_SCENE >= 0 and SWAP_QUERY:\n",
-            "    print(f'Swapping Scene {SWAP_SCENE} with new query: \"{SWAP_QUERY}\"')\n",
-            "    headers = {'Authorization': PEXELS_API_KEY}\n",
-            "    res = CONFIG['video_settings']['resolution']\n",
-            "    orientation = 'landscape' if res[0] > res[1] else 'portrait'\n",
-            "    url = f'https://api.pexels.com/videos/search?query={SWAP_QUERY}&orientation={orientation}&size=medium&per_page=5'\n",
-            "    response = requests.get(url, headers=headers)\n",
-            "    videos = response.json().get('videos', [])\n",
+            "if SWAP_SCENE >= 0:\n",
+            "    wait_for_audio()  # re-rendering the scene needs the voiceover and word timings\n",
+            "    if SWAP_QUERY:\n",
+            "        print(f'Searching new candidates for Scene {SWAP_SCENE}: \"{SWAP_QUERY}\"')\n",
+            "        res = CONFIG['video_settings']['resolution']\n",
+            "        orientation = 'landscape' if res[0] > res[1] else 'portrait'\n",
+            "        videos = pexels_search(SWAP_QUERY, orientation)\n",
+            "        if not videos:\n",
+            "            print('No videos found for that query. Try a different search term.')\n",
+            "        queue_candidates(SWAP_SCENE, videos, scene_picks.get(SWAP_SCENE))\n",
+            "        SWAP_CANDIDATE = 0\n",
+            "    \n",
+            "    candidates = scene_candidates.get(SWAP_SCENE, [])\n",
+            "    for n, c in enumerate(candidates):\n",
+            "        print(f\"  [{n}] {c['video'].get('duration')}s, {c['rendition'].get('width')}x{c['rendition'].get('height')} - {candidate_status(c)}\")\n",
             "    \n",
-            "    if not videos:\n",
-            "        print('No videos found for that query. Try a different search term.')\n",
+            "    if not 0 <= SWAP_CANDIDATE < len(candidates):\n",
+            "        print(f'No candidate {SWAP_CANDIDATE} for scene {SWAP_SCENE}. Set SWAP_QUERY to search for more.')\n",
             "    else:\n",
-            "        video = random.choice(videos)\n",
-            "        video_files = video.get('video_files', [])\n",
-            "        best_file = next((vf for vf in video_files if vf.get('quality') == 'hd'), video_files[0] if video_files else None)\n",
-            "        if best_file:\n",
-            "            new_path = os.path.join(PROJECT_DIR, f'scene_{SWAP_SCENE}.mp4')\n",
-            "            r = requests.get(best_file['link'], stream=True)\n",
-            "            with open(new_path, 'wb') as f:\n",
-            "                for chunk in r.iter_content(chunk_size=1024):\n",
-            "                    if chunk: f.write(chunk)\n",
-            "            b_roll_paths[SWAP_SCENE] = new_path\n",
-            "            print(f'Downloaded new B-roll for scene {SWAP_SCENE}.')\n",
-            "            \n",
-            "            # Re-render this scene (clean + new VTT)\n",
-            "            vid_path, vtt_path = render_scene_preview(SWAP_SCENE)\n",
-            "            scene_previews[SWAP_SCENE] = vid_path\n",
-            "            scene_vtts[SWAP_SCENE] = vtt_path\n",
-            "            print(f'\\nUpdated Scene {SWAP_SCENE} preview:')\n",
-            "            display(Video(vid_path, embed=True, width=480))\n",
+            "        chosen = candidates.pop(SWAP_CANDIDATE)\n",
+            "        swap_start = time.time()\n",
+            "        chosen['future'].result()  # Instant when the prefetch has finished\n",
+            "        # Link through the store again rather than from the prefetched path: the clip may have been evicted since\n",
+            "        new_path = ensure_asset(chosen['video'], chosen['rendition'], SWAP_SCENE,\n",
+            "                                os.path.join(PROJECT_DIR, f'scene_{SWAP_SCENE}.mp4'))\n",
+            "        if not new_path:\n",
+            "            raise RuntimeError(f'Could not download candidate {SWAP_CANDIDATE} for scene {SWAP_SCENE}.')\n",
+            "        b_roll_paths[SWAP_SCENE] = new_path\n",
+            "        # The replaced clip goes back into the pool so it can be swapped back in\n",
+            "        previous = scene_picks.get(SWAP_SCENE)\n",
+            "        scene_picks[SWAP_SCENE] = chosen['video']\n",
+            "        if previous:\n",
+            "            for _, _, v, r in video_candidates([previous], scene_length(SWAP_SCENE)):\n",
+            "                candidates.append({'video': v, 'rendition': r, 'future': prefetch_pool.submit(ensure_asset, v, r, SWAP_SCENE)})\n",
+            "        \n",
+            "        # Re-render this scene (clean + new VTT)\n",
+            "        vid_path, vtt_path = render_scene_preview(SWAP_SCENE)\n",
+            "        scene_previews[SWAP_SCENE] = vid_path\n",
+            "        scene_vtts[SWAP_SCENE] = vtt_path\n",
+            "        print(f'\\nUpdated Scene {SWAP_SCENE} preview in {time.time() - swap_start:.1f}s:')\n",
+            "        display(Video(vid_path, embed=True, width=480))\n",
             "else:\n",
-            "    print('No swap requested. Set SWAP_SCENE and SWAP_QUERY above, then re-run this cell.')\n",
-            "    print('Example: SWAP_SCENE = 3, SWAP_QUERY = \"ocean waves sunset\"')\n"
+            "    print('No swap requested. Set SWAP_SCENE (and SWAP_CANDIDATE or SWAP_QUERY) above, then re-run this cell.')\n",
+            "    print('Example: SWAP_SCENE = 3, SWAP_CANDIDATE = 1')"
         ]
     }
     
@@ -456,6 +1409,11 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "# 8. Stitch Final Video and Merge SRT Captions\n",
             "import time\n",
             "stitch_start = time.time()\n",
+            "wait_for_audio()  # caption offsets come from scene_bounds(), i.e. the audio stage's SCENE_OFFSETS\n",
+            "\n",
+            "missing_scenes = [i for i, p in enumerate(scene_previews) if p is None]\n",
+            "if missing_scenes:\n",
+            "    raise RuntimeError(f'Scenes {missing_scenes} have no preview. Re-render them with Cell 7 before stitching.')\n",
             "\n",
             "print('Stitching all scene previews into final video...')\n",
             "\n",
@@ -489,7 +1447,7 @@ def create_colab_notebook(topic_slug, config, scenes, pexels_api_key):
             "srt_counter = 1\n",
             "with open(srt_path, 'w') as f:\n",
             "    for scene_idx in range(len(SCENES)):\n",
-            "        scene_offset = scene_idx * scene_duration\n",
+            "        scene_offset = scene_bounds(scene_idx)[0]\n",
             "        phrases = get_scene_phrases(scene_idx)\n",
             "        for p in phrases:\n",
             "            global_start = p['start'] + scene_offset\n",
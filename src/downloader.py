@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import ffmpeg
+from .utils import load_config
+from .throttle import TokenBucket
+
+# Large writes keep multi-hundred-MB downloads I/O bound instead of stuck in the Python loop
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_DOWNLOAD_SETTINGS = {
+    "max_parallel": 4,
+    "max_connections": 8,
+    "max_bandwidth_mbps": 0,
+    "retries": 3,
+    "head_only": True,
+    "head_margin_seconds": 2,
+}
+
+# Client errors that are worth retrying (request timeout, rate limited); any other 4xx fails at once
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+class DownloadError(Exception):
+    pass
+
+def get_download_settings(config: dict = None) -> dict:
+    config = config or load_config()
+    return {**DEFAULT_DOWNLOAD_SETTINGS, **config.get("downloads", {})}
+
+class Downloader:
+    """Resumable HTTP downloads with a shared connection cap and an optional global bandwidth cap."""
+
+    def __init__(self, session: requests.Session = None, settings: dict = None):
+        self.session = session or requests.Session()
+        self.settings = settings or get_download_settings()
+        self.connections = threading.BoundedSemaphore(self.settings["max_connections"])
+        mbps = self.settings["max_bandwidth_mbps"]
+        self.bandwidth = TokenBucket(rate=mbps * 125_000, capacity=mbps * 125_000) if mbps else None
+
+    @staticmethod
+    def _discard_part(part_path: str):
+        for path in (part_path, part_path + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _fetch(self, url: str, part_path: str) -> int:
+        """Streams url into part_path, resuming from its current size. Returns the expected total size (or -1).
+
+        A sidecar <part>.json records the URL, ETag and total size the part file belongs to, so a leftover part
+        from another clip (or a changed resource) is discarded instead of being spliced onto.
+        """
+        meta_path = part_path + ".json"
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        if os.path.exists(part_path) and meta.get("url") != url:
+            self._discard_part(part_path)
+            meta = {}
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("etag"):
+                # The server answers with the full body (200) instead of a range if the ETag changed
+                headers["If-Range"] = meta["etag"]
+
+        with self.connections, self.session.get(url, headers=headers, stream=True, timeout=(10, 60)) as response:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            total = int(total) if total.isdigit() else -1
+            if offset and response.status_code in (206, 416) and meta.get("length", -1) not in (-1, total):
+                self._discard_part(part_path)
+                raise DownloadError(f"{url} changed size since the partial download; starting over")
+            if response.status_code == 416 and offset:
+                # Nothing left to fetch: the part file already holds the whole resource
+                return total if total >= 0 else offset
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                mode = "ab"
+                etag = response.headers.get("ETag") or meta.get("etag")
+            else:
+                # Fresh download, or the server ignored the Range header; start over
+                length = response.headers.get("Content-Length")
+                total = int(length) if length and not response.headers.get("Content-Encoding") else -1
+                mode = "wb"
+                etag = response.headers.get("ETag")
+            with open(meta_path, "w") as f:
+                json.dump({"url": url, "etag": etag, "length": total}, f)
+
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if self.bandwidth:
+                        self.bandwidth.acquire(len(chunk))
+                    f.write(chunk)
+        return total
+
+    def download(self, url: str, output_path: str, overwrite: bool = False) -> str:
+        """Downloads url to output_path via a .part file that is only renamed into place once its size checks out.
+
+        An existing output_path is reused unless `overwrite` is set; callers writing to a fixed project path
+        (rather than a content-keyed one such as an asset store staging path) should pass overwrite=True.
+        """
+        if os.path.exists(output_path) and not overwrite:
+            return output_path
+        part_path = output_path + ".part"
+        retries = self.settings["retries"]
+
+        for attempt in range(retries + 1):
+            try:
+                total = self._fetch(url, part_path)
+                size = os.path.getsize(part_path)
+                if total >= 0 and size != total:
+                    if size > total:
+                        self._discard_part(part_path)
+                    raise DownloadError(f"Expected {total} bytes from {url}, got {size}")
+                os.replace(part_path, output_path)
+                os.remove(part_path + ".json")
+                return output_path
+            except (requests.RequestException, DownloadError) as e:
+                status = e.response.status_code if isinstance(e, requests.HTTPError) and e.response is not None else None
+                if status and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS:
+                    raise DownloadError(f"Download failed with HTTP {status}: {url}") from e
+                if attempt == retries:
+                    raise DownloadError(f"Download failed after {retries + 1} attempts: {url}") from e
+                print(f"Download interrupted ({e}); resuming in {2 ** attempt}s...")
+                time.sleep(2 ** attempt)
+
+    def supports_range(self, url: str) -> bool:
+        with self.connections, self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=(10, 30)) as response:
+            return response.status_code == 206
+
+    def fetch_head(self, url: str, output_path: str, seconds: float, source_duration: float = None,
+                   overwrite: bool = False) -> str:
+        """Fetches only the first `seconds` (+ margin) of a remote video as a standalone clip.
+
+        ffmpeg reads the container index and then just the packets it needs via HTTP Range requests, and
+        stream-copies them into a trimmed mp4. Falls back to a full download when the server cannot serve
+        ranges or the trimmed clip comes out short (e.g. an index that ffmpeg cannot seek through).
+        """
+        if os.path.exists(output_path) and not overwrite:
+            return output_path
+        wanted = seconds + self.settings["head_margin_seconds"]
+        required = min(seconds, source_duration) if source_duration else seconds
+
+        try:
+            if self.supports_range(url):
+                part_path = output_path + ".head.part"
+                with self.connections:
+                    (
+                        ffmpeg.input(url, t=wanted).video
+                        .output(part_path, format="mp4", vcodec="copy", movflags="+faststart")
+                        .overwrite_output()
+                        .run(capture_stdout=True, capture_stderr=True)
+                    )
+                if float(ffmpeg.probe(part_path)["format"]["duration"]) >= required - 0.1:
+                    os.replace(part_path, output_path)
+                    return output_path
+                os.remove(part_path)
+                print(f"Head-only fetch came out short for {url}; downloading the full file.")
+        except (requests.RequestException, ffmpeg.Error, KeyError, ValueError) as e:
+            print(f"Head-only fetch failed for {url} ({e.__class__.__name__}); downloading the full file.")
+        return self.download(url, output_path, overwrite=overwrite)
+
+    def download_many(self, jobs: list[tuple], overwrite: bool = False) -> list[str | None]:
+        """Runs (url, output_path[, seconds[, source_duration]]) jobs in parallel.
+
+        Jobs with `seconds` go through fetch_head when head_only is enabled. Returns each output path,
+        or None where the download failed.
+        """
+        def run(job):
+            url, output_path, *head = job
+            try:
+                if head and head[0] and self.settings["head_only"]:
+                    return self.fetch_head(url, output_path, *head, overwrite=overwrite)
+                return self.download(url, output_path, overwrite=overwrite)
+            except DownloadError as e:
+                print(e)
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.settings["max_parallel"]) as pool:
+            return list(pool.map(run, jobs))
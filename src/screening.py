@@ -0,0 +1,92 @@
+import os
+import html
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from .utils import load_config, get_cache_dir
+from .visuals_fetcher import get_session, rank_videos
+
+def thumbnail_urls(video: dict, frames: int = 3) -> list[str]:
+    """Up to `frames` stills spread across the clip (Pexels video_pictures), falling back to the poster image."""
+    pictures = [p["picture"] for p in sorted(video.get("video_pictures", []), key=lambda p: p.get("nr", 0)) if p.get("picture")]
+    if len(pictures) > frames:
+        step = len(pictures) / frames
+        pictures = [pictures[int(i * step)] for i in range(frames)]
+    return pictures or ([video["image"]] if video.get("image") else [])
+
+def _fetch_thumbnail(url: str, cache_dir: str) -> str | None:
+    path = os.path.join(cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".jpg")
+    if os.path.exists(path):
+        return path
+    try:
+        response = get_session().get(url, timeout=15)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Thumbnail fetch failed for {url}: {e}")
+        return None
+    with open(path + ".part", "wb") as f:
+        f.write(response.content)
+    os.replace(path + ".part", path)
+    return path
+
+def fetch_thumbnails(urls: list[str], config: dict = None, max_workers: int = 16) -> dict[str, str]:
+    """Downloads thumbnails concurrently into the cache. Returns {url: local path} for the ones that arrived."""
+    cache_dir = get_cache_dir(config or load_config(), "thumbnails")
+    unique = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        paths = pool.map(lambda url: _fetch_thumbnail(url, cache_dir), unique)
+    return {url: path for url, path in zip(unique, paths) if path}
+
+def screen_candidates(queries: list[str], results: list[list[dict]], config: dict = None,
+                      top_n: int = 5, frames: int = 3) -> list[list[dict]]:
+    """Ranks each scene's results and pulls their thumbnails before any video is downloaded.
+
+    Returns, per scene, [{video, rendition, thumbnails}] in rank order, ready for a contact sheet or a pinned choice.
+    """
+    config = config or load_config()
+    resolution = config["video_settings"]["resolution"]
+    fps = config["video_settings"]["fps"]
+    b_roll_duration = config["pacing_and_editing"]["b_roll_duration_seconds"]
+
+    ranked = [rank_videos(videos, resolution, fps, b_roll_duration)[:top_n] for videos in results]
+    urls = [url for scene in ranked for video, _ in scene for url in thumbnail_urls(video, frames)]
+    print(f"Fetching {len(urls)} thumbnails for {sum(len(scene) for scene in ranked)} candidates...")
+    local = fetch_thumbnails(urls, config)
+
+    return [
+        [{"video": video, "rendition": rendition,
+          "thumbnails": [local[url] for url in thumbnail_urls(video, frames) if url in local]}
+         for video, rendition in scene]
+        for scene in ranked
+    ]
+
+def _b64_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+def write_contact_sheet(queries: list[str], candidates: list[list[dict]], html_path: str) -> str:
+    """Writes a self-contained HTML contact sheet: one row per scene, one tile per candidate, numbered by rank."""
+    rows = []
+    for i, (query, scene) in enumerate(zip(queries, candidates)):
+        tiles = []
+        for n, c in enumerate(scene):
+            images = "".join(
+                f'<img src="data:image/jpeg;base64,{_b64_file(p)}">'
+                for p in c["thumbnails"]
+            )
+            r = c["rendition"]
+            tiles.append(
+                f'<div class="tile"><div class="frames">{images}</div>'
+                f'<div>[{n}] {c["video"].get("duration")}s, {r.get("width")}x{r.get("height")}</div></div>'
+            )
+        rows.append(f'<h3>Scene {i}: {html.escape(query or "")}</h3><div class="row">{"".join(tiles)}</div>')
+
+    page = (
+        "<html><head><meta charset='utf-8'><style>"
+        "body{font-family:sans-serif;background:#111;color:#eee}.row{display:flex;gap:12px;flex-wrap:wrap}"
+        ".tile{background:#222;padding:6px;border-radius:6px;font-size:12px}.frames img{height:90px;margin-right:2px}"
+        "</style></head><body>" + "".join(rows) + "</body></html>"
+    )
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(page)
+    return html_path
@@ -0,0 +1,98 @@
+import os
+import json
+import time
+import sqlite3
+from .utils import load_config, get_cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT NOT NULL,
+    orientation TEXT NOT NULL,
+    size TEXT NOT NULL,
+    per_page INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    videos TEXT NOT NULL,
+    PRIMARY KEY (query, orientation, size, per_page)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def normalize_query(query: str) -> str:
+    """'  Ocean   Waves ' and 'ocean waves' are the same Pexels search."""
+    return " ".join(query.lower().split())
+
+class SearchCache:
+    """SQLite cache of Pexels search results with a TTL, stored under the local cache dir.
+
+    The Colab notebook keeps its own database (same schema) under its Drive cache root; the two files are not shared.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe to use from the search thread pool.
+        # Default rollback journal (not WAL), matching the notebook's copy of this cache on the Drive mount.
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _count(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, query: str, orientation: str, size: str, per_page: int) -> list[dict] | None:
+        """Returns cached `videos` for the search, or None on a miss or an expired entry."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fetched_at, videos FROM searches WHERE query = ? AND orientation = ? AND size = ? AND per_page = ?",
+                (normalize_query(query), orientation, size, per_page),
+            ).fetchone()
+            hit = row is not None and time.time() - row[0] < self.ttl_seconds
+            self._count(conn, "hits" if hit else "misses")
+        return json.loads(row[1]) if hit else None
+
+    def put(self, query: str, orientation: str, size: str, per_page: int, videos: list[dict]):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_query(query), orientation, size, per_page, time.time(), json.dumps(videos, separators=(",", ":"))),
+            )
+
+    def prune(self) -> int:
+        """Deletes expired entries. Returns the number removed."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM searches WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Lifetime hit/miss counts, hit ratio and entry count, for sizing the TTL."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0, "entries": entries}
+
+_CACHE = None
+
+def get_search_cache(config: dict = None) -> SearchCache:
+    """Process-wide cache built from the `caching` section of config.json."""
+    global _CACHE
+    if _CACHE is None:
+        config = config or load_config()
+        caching = config.get("caching", {})
+        db_path = os.path.join(get_cache_dir(config), caching.get("pexels_search_db", "pexels_search.sqlite"))
+        _CACHE = SearchCache(db_path, caching.get("pexels_search_ttl_hours", 72) * 3600)
+    return _CACHE
+
+if __name__ == "__main__":
+    stats = get_search_cache().stats()
+    print(f"Pexels search cache: {stats['entries']} entries, {stats['hits']} hits / {stats['misses']} misses "
+          f"({stats['hit_ratio']:.0%} hit ratio)")
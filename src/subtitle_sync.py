@@ -1,30 +1,274 @@
 import os
-import whisper
+import re
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import ffmpeg
+from .utils import file_sha256, load_config
 
-# Load model globally to avoid loading it on every call. "base" keeps it fast.
+# Word-level timestamps require word_timestamps=True
+TRANSCRIBE_OPTIONS = {"word_timestamps": True}
+DEFAULT_TRANSCRIPTION_SETTINGS = {
+    "backend": "openai-whisper",
+    "model": "base",
+    "compute_type": "int8",
+    "cpu_threads": 0,
+    # Long-form mode: audio longer than this is split at silences and transcribed in parallel
+    "long_form_threshold_seconds": 180,
+    "chunk_seconds": 60,
+    "workers": 0,
+}
+# Extra audio decoded on each side of a chunk so seam words are heard whole by one chunk
+CHUNK_PADDING_SECONDS = 1.0
+
+class OpenAIWhisperBackend:
+    """Reference backend: openai-whisper on PyTorch (fp32 on CPU)."""
+    name = "openai-whisper"
+
+    def __init__(self, settings: dict):
+        import whisper
+        if settings["cpu_threads"]:
+            import torch
+            torch.set_num_threads(settings["cpu_threads"])
+        self.model = whisper.load_model(settings["model"])
+
+    def transcribe(self, audio_path: str) -> list[dict]:
+        result = self.model.transcribe(audio_path, **TRANSCRIBE_OPTIONS)
+        words = []
+        for segment in result.get("segments", []):
+            for word in segment.get("words", []):
+                words.append({
+                    "word": word["word"].strip(),
+                    "start": word["start"],
+                    "end": word["end"]
+                })
+        return words
+
+class FasterWhisperBackend:
+    """CTranslate2 backend (faster-whisper) with quantized CPU inference, int8 by default."""
+    name = "faster-whisper"
+
+    def __init__(self, settings: dict):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(
+            settings["model"],
+            device="cpu",
+            compute_type=settings["compute_type"],
+            cpu_threads=settings["cpu_threads"],
+        )
+
+    def transcribe(self, audio_path: str) -> list[dict]:
+        segments, _ = self.model.transcribe(audio_path, **TRANSCRIBE_OPTIONS)
+        words = []
+        for segment in segments:
+            for word in segment.words or []:
+                words.append({
+                    "word": word.word.strip(),
+                    "start": word.start,
+                    "end": word.end
+                })
+        return words
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+# Load the backend globally to avoid loading the model on every call. "base" keeps it fast.
 MODEL = None
 
-def get_word_timestamps(audio_path: str) -> list[dict]:
-    """Uses Whisper to transcribe the given audio file and extract word-level timestamps."""
+def get_transcription_settings(config: dict = None) -> dict:
+    config = config or load_config()
+    settings = dict(DEFAULT_TRANSCRIPTION_SETTINGS)
+    settings.update(config.get("transcription", {}))
+    if settings["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{settings['backend']}'. Choose one of: {', '.join(BACKENDS)}")
+    return settings
+
+def load_backend(settings: dict = None):
+    """Returns the shared backend instance, (re)loading it if the settings changed."""
     global MODEL
-    if MODEL is None:
-        print("Loading Whisper model...")
-        MODEL = whisper.load_model("base")
-        
-    print(f"Transcribing audio from {audio_path}...")
-    # Word-level timestamps require word_timestamps=True
-    result = MODEL.transcribe(audio_path, word_timestamps=True)
-    
+    settings = settings or get_transcription_settings()
+    if MODEL is None or MODEL.settings != settings:
+        print(f"Loading {settings['backend']} model '{settings['model']}'...")
+        MODEL = BACKENDS[settings["backend"]](settings)
+        MODEL.settings = settings
+    return MODEL
+
+CACHE_DIRNAME = ".transcripts"
+CACHE_STATS = {"hits": 0, "misses": 0}
+
+# Model settings that change the words and timestamps; threads and workers only change speed
+CACHE_KEY_SETTINGS = ("backend", "model", "compute_type")
+
+def _cache_key(audio_path: str, settings: dict, long_form: bool) -> str:
+    # Chunked long-form output has different word boundaries from a whole-file pass, so the mode
+    # (and chunk size) is part of the key rather than long_form_threshold_seconds itself
+    payload = json.dumps({
+        "audio": file_sha256(audio_path),
+        "model": {name: settings[name] for name in CACHE_KEY_SETTINGS},
+        "chunk_seconds": settings["chunk_seconds"] if long_form else None,
+        "options": TRANSCRIBE_OPTIONS,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _cache_path(audio_path: str, key: str) -> str:
+    # Cached next to the audio, i.e. inside the project folder
+    return os.path.join(os.path.dirname(os.path.abspath(audio_path)), CACHE_DIRNAME, f"{key}.json.gz")
+
+def _load_cached(path: str) -> list[dict] | None:
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        entry = json.load(f)
+    os.utime(path)  # mark as recently used for pruning
+    return [{"word": w, "start": s, "end": e} for w, s, e in entry["words"]]
+
+def _save_cached(path: str, audio_path: str, settings: dict, words: list[dict]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entry = {
+        "source": os.path.abspath(audio_path),
+        "model": settings,
+        "options": TRANSCRIBE_OPTIONS,
+        # Compact [word, start, end] rows instead of one dict per word
+        "words": [[w["word"], round(w["start"], 3), round(w["end"], 3)] for w in words],
+    }
+    tmp_path = path + ".part"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def prune_transcription_cache(cache_dir: str, max_age_days: float = 30) -> int:
+    """Removes cached transcripts unused for max_age_days or whose source audio no longer exists. Returns count removed."""
+    if not os.path.isdir(cache_dir):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not name.endswith(".json.gz"):
+            continue
+        stale = os.path.getmtime(path) < cutoff
+        if not stale:
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    stale = not os.path.exists(json.load(f).get("source", ""))
+            except (OSError, ValueError):
+                stale = True  # unreadable entry
+        if stale:
+            os.remove(path)
+            removed += 1
+    return removed
+
+def _find_silences(audio_path: str) -> list[float]:
+    """Returns the midpoints of silent stretches, via ffmpeg's silencedetect filter."""
+    proc = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-i", audio_path, "-af", "silencedetect=noise=-35dB:d=0.25", "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    starts = [float(m) for m in re.findall(r"silence_start: ([\d.]+)", proc.stderr)]
+    ends = [float(m) for m in re.findall(r"silence_end: ([\d.]+)", proc.stderr)]
+    return [(start + end) / 2 for start, end in zip(starts, ends)]
+
+def plan_chunks(duration: float, silences: list[float], chunk_seconds: float) -> list[tuple[float, float]]:
+    """Splits [0, duration] into ~chunk_seconds pieces, cutting at the silence nearest each target."""
+    bounds = [0.0]
+    while duration - bounds[-1] > chunk_seconds * 1.5:
+        target = bounds[-1] + chunk_seconds
+        window = [t for t in silences if bounds[-1] + chunk_seconds / 2 <= t <= bounds[-1] + chunk_seconds * 1.5]
+        # No pause nearby: hard cut; the padded chunks and midpoint ownership still keep each word exactly once
+        bounds.append(min(window, key=lambda t: abs(t - target)) if window else target)
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+_WORKER_BACKEND = None
+
+def _init_chunk_worker(settings: dict):
+    global _WORKER_BACKEND
+    _WORKER_BACKEND = BACKENDS[settings["backend"]](settings)
+
+def _transcribe_chunk(job: dict) -> list[dict]:
+    """Transcribes one padded chunk and keeps only the words whose midpoint falls inside the chunk it owns."""
     words = []
-    for segment in result.get("segments", []):
-        for word in segment.get("words", []):
-            words.append({
-                "word": word["word"].strip(),
-                "start": word["start"],
-                "end": word["end"]
-            })
+    for w in _WORKER_BACKEND.transcribe(job["path"]):
+        start, end = w["start"] + job["offset"], w["end"] + job["offset"]
+        if job["own_start"] <= (start + end) / 2 < job["own_end"]:
+            words.append({"word": w["word"], "start": start, "end": end})
+    return words
+
+def merge_chunk_words(chunks: list[list[dict]]) -> list[dict]:
+    """Joins per-chunk word lists in time order, dropping any repeat of the same word at the same instant."""
+    merged = []
+    for words in chunks:
+        for w in words:
+            if merged and merged[-1]["word"] == w["word"] and abs(merged[-1]["start"] - w["start"]) < 0.05:
+                continue
+            merged.append(w)
+    return merged
+
+def transcribe_long_form(audio_path: str, settings: dict) -> list[dict]:
+    """Splits audio at silences and transcribes the chunks across worker processes (one model load per worker)."""
+    duration = float(ffmpeg.probe(audio_path)["format"]["duration"])
+    chunks = plan_chunks(duration, _find_silences(audio_path), settings["chunk_seconds"])
+    workers = min(settings["workers"] or os.cpu_count() or 1, len(chunks))
+    worker_settings = dict(settings, cpu_threads=settings["cpu_threads"] or max(1, (os.cpu_count() or 1) // workers))
+
+    work_dir = tempfile.mkdtemp(prefix="transcribe_")
+    try:
+        jobs = []
+        for i, (own_start, own_end) in enumerate(chunks):
+            offset = max(0.0, own_start - CHUNK_PADDING_SECONDS)
+            chunk_path = os.path.join(work_dir, f"chunk_{i:04d}.wav")
+            (
+                ffmpeg.input(audio_path, ss=offset, t=own_end + CHUNK_PADDING_SECONDS - offset)
+                .output(chunk_path, ac=1, ar=16000)
+                .overwrite_output()
+                .run(quiet=True)
+            )
+            jobs.append({"path": chunk_path, "offset": offset, "own_start": own_start, "own_end": own_end})
+
+        print(f"Transcribing {len(jobs)} chunks with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunk_worker, initargs=(worker_settings,)) as pool:
+            return merge_chunk_words(pool.map(_transcribe_chunk, jobs))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def get_word_timestamps(audio_path: str, tts_words: list[dict] = None) -> list[dict]:
+    """Uses Whisper (via the configured transcription backend) to transcribe the given audio file and extract word-level timestamps.
+
+    If the TTS engine already reported word boundaries (see voiceover_gen.generate_voiceover),
+    pass them as tts_words and Whisper is skipped entirely.
+    """
+    if tts_words:
+        print(f"Using {len(tts_words)} word boundaries from TTS, skipping Whisper.")
+        return tts_words
+
+    settings = get_transcription_settings()
+    duration = float(ffmpeg.probe(audio_path)["format"]["duration"])
+    long_form = duration > settings["long_form_threshold_seconds"]
+    cache_path = _cache_path(audio_path, _cache_key(audio_path, settings, long_form))
+    cached = _load_cached(cache_path)
+    if cached is not None:
+        CACHE_STATS["hits"] += 1
+        print(f"Using cached transcription for {audio_path} ({len(cached)} words).")
+        return cached
+    CACHE_STATS["misses"] += 1
+
+    if long_form:
+        print(f"Transcribing {duration:.0f}s of audio from {audio_path} in long-form mode...")
+        words = transcribe_long_form(audio_path, settings)
+    else:
+        backend = load_backend(settings)
+        print(f"Transcribing audio from {audio_path}...")
+        words = backend.transcribe(audio_path)
             
     print(f"Transcription complete. Found {len(words)} words.")
+    _save_cached(cache_path, audio_path, settings, words)
     return words
 
 if __name__ == "__main__":
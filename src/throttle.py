@@ -0,0 +1,40 @@
+import time
+import threading
+
+class TokenBucket:
+    """Thread-safe token bucket. Used for API request budgets and download bandwidth caps."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1):
+        """Blocks until `amount` tokens are available. Requests larger than the bucket run into debt instead of waiting forever."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= min(amount, self.capacity):
+                    self.tokens -= amount
+                    return
+                wait = max(self.paused_until - now, (min(amount, self.capacity) - self.tokens) / self.rate)
+            time.sleep(min(wait, 1.0))
+
+    def sync(self, remaining: int, reset_in: float):
+        """Aligns the bucket with the server's view of the budget (e.g. X-Ratelimit-* headers)."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_in > 0:
+                self.pause(reset_in)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
@@ -1,5 +1,6 @@
 import os
 import json
+import hashlib
 from dotenv import load_dotenv
 
 # Project root is one level up from src/
@@ -16,3 +17,18 @@ def get_env_var(key):
     if not val:
         raise ValueError(f"Environment variable {key} not set. Please check your .env file.")
     return val
+
+def get_cache_dir(config, *parts):
+    """Returns (and creates) a directory under the configured cache root, relative to the project root."""
+    root = config.get('caching', {}).get('cache_dir', 'cache')
+    path = os.path.join(_PROJECT_ROOT, root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Streams a file through SHA-256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
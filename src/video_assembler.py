@@ -1,11 +1,249 @@
 import os
 import json
-from moviepy import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip, concatenate_videoclips
+import math
+import shutil
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import ffmpeg
 from .utils import load_config
+from .ass_subtitles import write_ass, resolve_font, ass_filter_arg
+from .broll_cache import fill_frame, get_broll_proxies, is_broll_proxy
 import textwrap
 
 def generate_video(script_scenes: list, voiceover_path: str, b_roll_paths: list[str], word_timestamps: list[dict], output_path: str):
+    """Combines B-roll, voiceover, and text into a final video using the configured render engine."""
+    config = load_config()
+    engine = config['video_settings'].get('render_engine', 'ffmpeg')
+    if engine not in RENDER_ENGINES:
+        raise ValueError(f"Unknown render engine '{engine}'. Choose one of: {', '.join(RENDER_ENGINES)}")
+    if config.get('caching', {}).get('use_broll_proxies', True):
+        # Decode/scale/crop each source once; engines then only trim and concat the proxies
+        b_roll_paths = get_broll_proxies(b_roll_paths, config)
+    return RENDER_ENGINES[engine](script_scenes, voiceover_path, b_roll_paths, word_timestamps, output_path)
+
+# Shared by the serial and segmented engines so segments stream-copy into the same bitstream
+VIDEO_ENCODER_ARGS = {'vcodec': 'libx264', 'pix_fmt': 'yuv420p'}
+
+def _probe_duration(path: str) -> float:
+    return float(ffmpeg.probe(path)['format']['duration'])
+
+def _frame_count(duration: float, fps: int) -> int:
+    """Frames whose start time falls before `duration` (tolerating float noise on exact multiples)."""
+    return math.ceil(duration * fps - 1e-6)
+
+def _plan_b_roll_timeline(b_roll_paths: list[str], total_duration: float, b_roll_duration: float) -> list[tuple[str, float]]:
+    """Returns (b_roll_file, duration) pairs covering the voiceover, cycling through the B-roll like the MoviePy engine."""
+    if not b_roll_paths:
+        raise ValueError("No B-roll videos provided.")
+
+    source_durations = {}
+    timeline = []
+    current_time = 0
+    b_roll_idx = 0
+
+    while current_time < total_duration:
+        b_roll_file = b_roll_paths[b_roll_idx % len(b_roll_paths)]
+        if not os.path.exists(b_roll_file):
+            raise FileNotFoundError(f"B-roll not found: {b_roll_file}")
+        if b_roll_file not in source_durations:
+            source_durations[b_roll_file] = _probe_duration(b_roll_file)
+
+        clip_duration = min(b_roll_duration, total_duration - current_time, source_durations[b_roll_file])
+        if clip_duration <= 0:
+            raise ValueError(f"B-roll has no usable footage: {b_roll_file}")
+
+        timeline.append((b_roll_file, clip_duration))
+        current_time += clip_duration
+        b_roll_idx += 1
+
+    return timeline
+
+def _burn_subtitles(stream, ass_path: str, config: dict):
+    _, fonts_dir = resolve_font(config['visuals_and_subtitles']['font_family'])
+    if fonts_dir:
+        return stream.filter('ass', ass_path, fontsdir=fonts_dir)
+    return stream.filter('ass', ass_path)
+
+def _run_ffmpeg(stream_spec):
+    try:
+        stream_spec.overwrite_output().run(capture_stdout=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        print(e.stderr.decode(errors='replace')[-2000:])
+        raise
+
+def generate_video_ffmpeg(script_scenes: list, voiceover_path: str, b_roll_paths: list[str], word_timestamps: list[dict], output_path: str):
+    """Combines B-roll, voiceover, and text into a final video with a single FFmpeg filter graph."""
+    config = load_config()
+    target_w, target_h = config['video_settings']['resolution']
+    fps = config['video_settings']['fps']
+
+    if not os.path.exists(voiceover_path):
+        raise FileNotFoundError(f"Voiceover not found: {voiceover_path}")
+    total_duration = _probe_duration(voiceover_path)
+
+    b_roll_duration = config['pacing_and_editing']['b_roll_duration_seconds']
+    timeline = _plan_b_roll_timeline(b_roll_paths, total_duration, b_roll_duration)
+
+    # scale -> crop per clip (proxies are already conformed), then concat into one video stream.
+    # ffmpeg-python merges identical nodes, so a clip that repeats in the cycle is built once and split.
+    repeats = Counter(timeline)
+    chains = {}
+    for b_roll_file, clip_duration in repeats:
+        chain = fill_frame(ffmpeg.input(b_roll_file, t=clip_duration).video, target_w, target_h, fps,
+                           prescaled=is_broll_proxy(b_roll_file, config))
+        chains[b_roll_file, clip_duration] = chain.split() if repeats[b_roll_file, clip_duration] > 1 else chain
+    used = Counter()
+    clips = []
+    for clip in timeline:
+        clips.append(chains[clip][used[clip]] if repeats[clip] > 1 else chains[clip])
+        used[clip] += 1
+    video_stream = ffmpeg.concat(*clips, v=1, a=0)
+
+    # Subtitles are burned by libass from an ASS track instead of per-word layers
+    ass_path = os.path.splitext(output_path)[0] + ".ass"
+    write_ass(word_timestamps, ass_path, config)
+    video_stream = _burn_subtitles(video_stream, ass_path, config)
+
+    audio_stream = ffmpeg.input(voiceover_path).audio
+
+    print(f"Rendering final video to {output_path}...")
+    _run_ffmpeg(
+        ffmpeg.output(video_stream, audio_stream, output_path,
+                      acodec='aac', r=fps, t=total_duration, movflags='+faststart',
+                      **VIDEO_ENCODER_ARGS)
+    )
+    print("Video generation complete.")
+
+def _render_segment(job: dict) -> str:
+    """Renders one video-only segment. Runs in a worker process."""
+    video = fill_frame(ffmpeg.input(job['b_roll_file'], t=job['duration']).video, job['width'], job['height'], job['fps'],
+                       prescaled=job['prescaled'])
+    # Shift onto the global timeline so libass picks the same events as a serial render, then back to zero
+    video = video.filter('setpts', f"PTS-STARTPTS+{job['start']}/TB")
+    video = _burn_subtitles(video, job['ass_path'], job['config'])
+    video = video.filter('setpts', 'PTS-STARTPTS')
+    _run_ffmpeg(
+        ffmpeg.output(video, job['output_path'], r=job['fps'], threads=job['threads'],
+                      **{'frames:v': job['frames']}, **VIDEO_ENCODER_ARGS)
+    )
+    return job['output_path']
+
+def probe_av_timing(path: str) -> dict:
+    """Returns container, video and audio durations plus stream start times for a rendered file."""
+    probe = ffmpeg.probe(path)
+    timing = {'duration': float(probe['format']['duration'])}
+    for stream in probe['streams']:
+        kind = stream.get('codec_type')
+        if kind in ('video', 'audio') and kind not in timing:
+            timing[kind] = {
+                'duration': float(stream.get('duration', timing['duration'])),
+                'start': float(stream.get('start_time', 0)),
+            }
+    return timing
+
+def check_render_parity(candidate_path: str, reference: dict | str, fps: int) -> dict:
+    """Checks that a render matches a reference (serial render path or expected timing) in duration and A/V sync.
+
+    Raises ValueError when the duration or audio/video offset drifts by more than a frame.
+    """
+    tolerance = 1.0 / fps
+    actual = probe_av_timing(candidate_path)
+    expected = probe_av_timing(reference) if isinstance(reference, str) else reference
+
+    if abs(actual['duration'] - expected['duration']) > tolerance:
+        raise ValueError(f"Duration mismatch: {actual['duration']:.3f}s vs {expected['duration']:.3f}s")
+    for kind in ('video', 'audio'):
+        if kind in expected and abs(actual[kind]['duration'] - expected[kind]['duration']) > tolerance:
+            raise ValueError(f"{kind.capitalize()} duration mismatch: {actual[kind]['duration']:.3f}s vs {expected[kind]['duration']:.3f}s")
+
+    av_offset = actual['audio']['start'] - actual['video']['start']
+    expected_offset = expected['audio']['start'] - expected['video']['start']
+    if abs(av_offset - expected_offset) > tolerance:
+        raise ValueError(f"A/V sync drift: audio starts {av_offset:.3f}s after video (expected {expected_offset:.3f}s)")
+    return actual
+
+def generate_video_segmented(script_scenes: list, voiceover_path: str, b_roll_paths: list[str], word_timestamps: list[dict], output_path: str):
+    """Renders B-roll segments in parallel processes and joins them with the concat demuxer (no re-encode)."""
+    config = load_config()
+    target_w, target_h = config['video_settings']['resolution']
+    fps = config['video_settings']['fps']
+    workers = config['video_settings'].get('render_workers') or os.cpu_count() or 1
+
+    if not os.path.exists(voiceover_path):
+        raise FileNotFoundError(f"Voiceover not found: {voiceover_path}")
+    total_duration = _probe_duration(voiceover_path)
+
+    b_roll_duration = config['pacing_and_editing']['b_roll_duration_seconds']
+    timeline = _plan_b_roll_timeline(b_roll_paths, total_duration, b_roll_duration)
+
+    ass_path = os.path.splitext(output_path)[0] + ".ass"
+    write_ass(word_timestamps, ass_path, config)
+
+    work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # Count frames like the serial graph: each trimmed clip keeps every frame starting before its end,
+        # and the output -t keeps every frame starting before the voiceover ends
+        total_frames = _frame_count(total_duration, fps)
+        jobs = []
+        start_frame = 0
+        for i, (b_roll_file, clip_duration) in enumerate(timeline):
+            frames = min(_frame_count(clip_duration, fps), total_frames - start_frame)
+            if frames <= 0:
+                continue
+            jobs.append({
+                'b_roll_file': b_roll_file,
+                'duration': clip_duration,
+                'start': start_frame / fps,
+                'frames': frames,
+                'width': target_w,
+                'height': target_h,
+                'fps': fps,
+                'prescaled': is_broll_proxy(b_roll_file, config),
+                'threads': max(1, (os.cpu_count() or 1) // workers),
+                'ass_path': os.path.abspath(ass_path),
+                'config': config,
+                'output_path': os.path.join(work_dir, f"segment_{i:04d}.mp4"),
+            })
+            start_frame += frames
+
+        print(f"Rendering {len(jobs)} segments with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            segment_paths = list(pool.map(_render_segment, jobs))
+
+        concat_path = os.path.join(work_dir, "concat_list.txt")
+        with open(concat_path, "w") as f:
+            for p in segment_paths:
+                f.write(f"file '{p}'\n")
+
+        # Video is stream-copied; the voiceover is encoded once so there are no AAC priming gaps at the seams
+        print(f"Joining segments into {output_path}...")
+        video_in = ffmpeg.input(concat_path, format='concat', safe=0)
+        audio_in = ffmpeg.input(voiceover_path)
+        _run_ffmpeg(
+            ffmpeg.output(video_in.video, audio_in.audio, output_path,
+                          vcodec='copy', acodec='aac', t=total_duration, movflags='+faststart')
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if config['video_settings'].get('verify_segmented_render', False):
+        # Render the same inputs serially and hold the joined segments to it (doubles the render time)
+        reference_dir = tempfile.mkdtemp(prefix="reference_", dir=os.path.dirname(os.path.abspath(output_path)))
+        try:
+            reference_path = os.path.join(reference_dir, "serial.mp4")
+            print("Rendering serial reference for the parity check...")
+            generate_video_ffmpeg(script_scenes, voiceover_path, b_roll_paths, word_timestamps, reference_path)
+            check_render_parity(output_path, reference_path, fps)
+        finally:
+            shutil.rmtree(reference_dir, ignore_errors=True)
+        print("Segmented render verified: duration and A/V sync match a serial render.")
+    print("Video generation complete.")
+
+def generate_video_moviepy(script_scenes: list, voiceover_path: str, b_roll_paths: list[str], word_timestamps: list[dict], output_path: str):
     """Combines B-roll, voiceover, and text into a final video using MoviePy."""
+    from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
+
     config = load_config()
     
     # 1. Video Settings
@@ -62,45 +300,24 @@ def generate_video(script_scenes: list, voiceover_path: str, b_roll_paths: list[
     final_video = final_video.with_audio(audio_clip)
     
     # 4. Burn in Subtitles
-    # Group words into chunks and overlay
-    text_clips = []
-    
-    max_words = config['visuals_and_subtitles']['max_words_per_line']
-    font_size = config['visuals_and_subtitles']['font_size']
-    font = config['visuals_and_subtitles']['font_family']
-    color = "white" # defaulting to generic colors for MoviePy textclip
-    stroke_color = "black"
-    stroke_width = 2
-    
-    # Simple chunking for subtitles
-    for word in word_timestamps:
-        txt_clip = TextClip(
-            font=font,
-            text=word['word'],
-            font_size=font_size,
-            color=color,
-            stroke_color=stroke_color,
-            stroke_width=stroke_width,
-            method="caption",
-            size=(target_res[0] - 100, None)
-        )
-        # Position in center
-        txt_clip = txt_clip.with_position(('center', 'center'))
-        txt_clip = txt_clip.with_start(word['start'])
-        txt_clip = txt_clip.with_end(word['end'])
-        
-        text_clips.append(txt_clip)
-        
-    # Combine everything
-    composite = CompositeVideoClip([final_video] + text_clips)
+    # libass renders one karaoke line per frame during the encode instead of a TextClip layer per word
+    ass_path = os.path.splitext(output_path)[0] + ".ass"
+    write_ass(word_timestamps, ass_path, config)
     
     # 5. Render
     print(f"Rendering final video to {output_path}...")
-    composite.write_videofile(
+    final_video.write_videofile(
         output_path, 
         fps=fps, 
         codec="libx264", 
         audio_codec="aac",
-        threads=4
+        threads=4,
+        ffmpeg_params=["-vf", ass_filter_arg(ass_path, config)]
     )
     print("Video generation complete.")
+
+RENDER_ENGINES = {
+    "ffmpeg": generate_video_ffmpeg,
+    "segmented": generate_video_segmented,
+    "moviepy": generate_video_moviepy,
+}
@@ -1,66 +1,251 @@
 import os
+import time
 import requests
 import random
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from .utils import get_env_var, load_config
+from .throttle import TokenBucket
+from .search_cache import get_search_cache, normalize_query
+from .downloader import Downloader, DownloadError
+from .asset_store import get_asset_store
+
+# Overridable so the fetcher can be pointed at a local mock server
+PEXELS_API_BASE = "https://api.pexels.com"
+# Free tier: 200 requests/hour. The bucket is re-synced from X-Ratelimit-* headers on every response.
+PEXELS_RATE_LIMIT = TokenBucket(rate=200 / 3600, capacity=20)
+
+_SESSION = None
+
+def get_session(pool_size: int = 16) -> requests.Session:
+    """Shared HTTP session so every Pexels call reuses pooled keep-alive connections."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        _SESSION.mount("https://", adapter)
+        _SESSION.mount("http://", adapter)
+    return _SESSION
+
+def _sync_rate_limit(response: requests.Response):
+    remaining = response.headers.get("X-Ratelimit-Remaining")
+    reset = response.headers.get("X-Ratelimit-Reset")
+    if remaining is not None and reset is not None:
+        PEXELS_RATE_LIMIT.sync(int(remaining), float(reset) - time.time())
+
+def search_pexels_videos(query: str, orientation: str = "portrait", size: str = "medium", per_page: int = 5,
+                         use_cache: bool = True) -> list[dict]:
+    """Returns the raw Pexels `videos` results for a query, or an empty list on failure."""
+    cache = get_search_cache() if use_cache else None
+    if cache:
+        cached = cache.get(query, orientation, size, per_page)
+        if cached is not None:
+            return cached
+
+    headers = {"Authorization": get_env_var("PEXELS_API_KEY")}
+    params = {"query": query, "orientation": orientation, "size": size, "per_page": per_page}
+
+    for attempt in range(2):
+        PEXELS_RATE_LIMIT.acquire()
+        response = get_session().get(f"{PEXELS_API_BASE}/videos/search", params=params, headers=headers, timeout=30)
+        _sync_rate_limit(response)
+        if response.status_code == 429 and attempt == 0:
+            # Budget exhausted: wait for the window to reset, then try once more
+            reset = float(response.headers.get("X-Ratelimit-Reset", time.time() + 60))
+            PEXELS_RATE_LIMIT.pause(max(reset - time.time(), 1))
+            continue
+        break
 
-def get_pexels_video(query: str, orientation: str = "portrait", size: str = "medium") -> str:
-    """Fetches a free stock video URL from Pexels based on the query."""
-    api_key = get_env_var("PEXELS_API_KEY")
-    headers = {"Authorization": api_key}
-    
-    url = f"https://api.pexels.com/videos/search?query={query}&orientation={orientation}&size={size}&per_page=5"
-    
-    response = requests.get(url, headers=headers)
-    
     if response.status_code != 200:
         print(f"Failed to fetch videos from Pexels: {response.status_code}")
         print(response.text)
-        return ""
-        
-    data = response.json()
-    videos = data.get("videos", [])
-    
+        return []
+    videos = response.json().get("videos", [])
+    if cache:
+        cache.put(query, orientation, size, per_page, videos)
+    return videos
+
+def search_pexels_videos_batch(queries: list[str], orientation: str = "portrait", size: str = "medium",
+                               per_page: int = 5, max_workers: int = 8) -> list[list[dict]]:
+    """Runs all scene queries concurrently over the pooled session. Results come back in query order."""
+    # Scenes often repeat a query; search each distinct one once
+    unique = list(dict.fromkeys(normalize_query(q) for q in queries if q))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = dict(zip(unique, pool.map(lambda q: search_pexels_videos(q, orientation, size, per_page), unique)))
+    return [results[normalize_query(q)] if q else [] for q in queries]
+
+# Rough H.264 stock-footage bitrate, only used to compare renditions when Pexels omits file sizes
+_BITS_PER_PIXEL_FRAME = 0.1
+
+def _upscale_factor(vf: dict, target_w: int, target_h: int) -> float:
+    """How much the fill-frame scale has to enlarge this rendition (<= 1 means it already covers the target)."""
+    return max(target_w / vf["width"], target_h / vf["height"])
+
+def estimate_rendition_bytes(vf: dict, duration: float) -> float:
+    """Pexels' reported size when present, otherwise pixels x fps x duration at a nominal bitrate."""
+    if vf.get("size"):
+        return float(vf["size"])
+    return vf["width"] * vf["height"] * (vf.get("fps") or 30) * max(duration, 1) * _BITS_PER_PIXEL_FRAME / 8
+
+def select_rendition(video_files: list[dict], resolution: list, fps: float, duration: float = 0) -> dict | None:
+    """Picks the cheapest mp4 rendition that covers `resolution` at `fps`; falls back to the least upscaled one."""
+    target_w, target_h = resolution
+    usable = [vf for vf in video_files if vf.get("width") and vf.get("height") and vf.get("link")
+              and vf.get("file_type", "video/mp4") == "video/mp4"]
+    if not usable:
+        return video_files[0] if video_files else None
+
+    def score(vf):
+        covers = _upscale_factor(vf, target_w, target_h) <= 1.0
+        # Dropping frames is invisible, duplicating them judders
+        smooth = (vf.get("fps") or fps) >= fps * 0.95
+        if covers:
+            return (0, not smooth, estimate_rendition_bytes(vf, duration))
+        return (1, _upscale_factor(vf, target_w, target_h), not smooth)
+
+    return min(usable, key=score)
+
+def _video_candidates(videos: list[dict], resolution: list, fps: float, min_duration: float) -> list[tuple]:
+    """(too_short, estimated bytes, video, rendition) for every usable result, best first."""
+    candidates = []
+    for video in videos:
+        rendition = select_rendition(video.get("video_files", []), resolution, fps, video.get("duration", 0))
+        if rendition:
+            cost = estimate_rendition_bytes(rendition, video.get("duration", 0)) if rendition.get("width") else float("inf")
+            # Clips shorter than the scene force a freeze or loop, so they rank after everything that fits
+            candidates.append((video.get("duration", 0) < min_duration, cost, video, rendition))
+    return sorted(candidates, key=lambda c: c[:2])
+
+def rank_videos(videos: list[dict], resolution: list, fps: float, min_duration: float) -> list[tuple[dict, dict]]:
+    """All usable (video, rendition) pairs, best first; used to build swap candidate pools."""
+    return [(video, rendition) for _, _, video, rendition in _video_candidates(videos, resolution, fps, min_duration)]
+
+def select_video(videos: list[dict], resolution: list, fps: float, min_duration: float) -> tuple[dict, dict] | None:
+    """Chooses a (video, rendition) pair: long enough for the scene and cheap to download, with some variety."""
+    candidates = _video_candidates(videos, resolution, fps, min_duration)
+    if not candidates:
+        return None
+
+    too_short, best = candidates[0][:2]
+    # Select randomly among the near-cheapest results to keep variety across runs
+    _, _, video, rendition = random.choice([c for c in candidates if c[0] == too_short and c[1] <= best * 2])
+    return video, rendition
+
+def _pick_video_link(query: str, videos: list[dict], config: dict = None) -> str:
     if not videos:
         print(f"No videos found for query '{query}'")
         return ""
-        
-    # Select a random video from the top 5 results to add variety
-    video = random.choice(videos)
-    video_files = video.get("video_files", [])
-    
-    if not video_files:
+
+    config = config or load_config()
+    choice = select_video(
+        videos,
+        config["video_settings"]["resolution"],
+        config["video_settings"]["fps"],
+        config["pacing_and_editing"]["b_roll_duration_seconds"],
+    )
+    if not choice:
         return ""
-        
-    # Find the link corresponding to the best quality hd or sd
-    best_file = None
-    for vf in video_files:
-        if vf.get("quality") == "hd":
-            best_file = vf
-            break
-            
-    if not best_file:
-        best_file = video_files[0]
-        
-    return best_file.get("link", "")
+    _, rendition = choice
+    return rendition.get("link", "")
+
+def get_pexels_video(query: str, orientation: str = "portrait", size: str = "medium") -> str:
+    """Fetches a free stock video URL from Pexels based on the query."""
+    return _pick_video_link(query, search_pexels_videos(query, orientation, size))
+
+def get_pexels_videos(queries: list[str], orientation: str = "portrait", size: str = "medium") -> list[str]:
+    """Batch version of get_pexels_video: one URL (or "") per query, in the same order."""
+    results = search_pexels_videos_batch(queries, orientation, size)
+    stats = get_search_cache().stats()
+    print(f"Pexels search cache hit ratio: {stats['hit_ratio']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+    config = load_config()
+    return [_pick_video_link(q, videos, config) for q, videos in zip(queries, results)]
 
-def download_video(url: str, output_path: str) -> bool:
-    """Downloads a video from a given URL to the output path."""
+_DOWNLOADER = None
+
+def get_downloader() -> Downloader:
+    """Process-wide downloader on the pooled session, so the connection and bandwidth caps are global."""
+    global _DOWNLOADER
+    if _DOWNLOADER is None:
+        _DOWNLOADER = Downloader(get_session())
+    return _DOWNLOADER
+
+def download_video(url: str, output_path: str, max_seconds: float = None) -> bool:
+    """Downloads a video from a given URL to the output path (only the first max_seconds when head_only is on)."""
     if not url:
         return False
         
     print(f"Downloading video from {url} to {output_path}...")
-    response = requests.get(url, stream=True)
-    
-    if response.status_code == 200:
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    f.write(chunk)
-        print("Download complete.")
-        return True
-    else:
-        print(f"Failed to download video: {response.status_code}")
+    downloader = get_downloader()
+    try:
+        if max_seconds and downloader.settings["head_only"]:
+            downloader.fetch_head(url, output_path, max_seconds, overwrite=True)
+        else:
+            downloader.download(url, output_path, overwrite=True)
+    except DownloadError as e:
+        print(f"Failed to download video: {e}")
         return False
+    print("Download complete.")
+    return True
+
+def download_videos(jobs: list[tuple[str, str]], max_seconds: float = None) -> list[bool]:
+    """Parallel version of download_video for (url, output_path) pairs; jobs with an empty URL are skipped."""
+    valid = [(url, path, max_seconds) for url, path in jobs if url]
+    print(f"Downloading {len(valid)} videos...")
+    done = set(get_downloader().download_many(valid, overwrite=True))
+    return [bool(url) and path in done for url, path in jobs]
+
+def fetch_pexels_clips(picks: list[tuple[dict, dict] | None], output_paths: list[str], max_seconds: float = None) -> list[bool]:
+    """Places each picked (video, rendition) at its output path, serving repeats from the shared asset store.
+
+    Only store misses touch the network; they are downloaded in parallel (head-only when enabled), added to the
+    store and then hardlinked into the project.
+    """
+    store = get_asset_store()
+    downloader = get_downloader()
+    seconds = max_seconds if max_seconds and downloader.settings["head_only"] else 0
+
+    missing = {}
+    wanted = {(video["id"], rendition["id"]): (video, rendition) for video, rendition in filter(None, picks)}
+    for key, (video, rendition) in wanted.items():
+        if not store.lookup(*key, seconds):
+            missing[key] = (rendition["link"], store.staging_path(*key, seconds), seconds, video.get("duration"))
+    if missing:
+        print(f"Asset store: {len(wanted) - len(missing)} clips already stored, downloading {len(missing)}...")
+        for key, staged in zip(missing, downloader.download_many(list(missing.values()))):
+            if staged:
+                store.add(*key, seconds, staged)
+
+    results = []
+    for pick, output_path in zip(picks, output_paths):
+        stored = pick and store.lookup(pick[0]["id"], pick[1]["id"], seconds)
+        if stored:
+            store.link(stored, output_path)
+        results.append(bool(stored))
+    return results
+
+def get_pexels_clips(queries: list[str], output_dir: str, orientation: str = "portrait", size: str = "medium",
+                     config: dict = None, choices: dict[int, int] = None) -> list[str | None]:
+    """Search, pick and fetch one B-roll clip per query into output_dir/scene_{i}.mp4 (None where nothing was found).
+
+    `choices` pins scene index -> rank_videos index (e.g. after reviewing a contact sheet); other scenes use select_video.
+    """
+    config = config or load_config()
+    resolution = config["video_settings"]["resolution"]
+    fps = config["video_settings"]["fps"]
+    b_roll_duration = config["pacing_and_editing"]["b_roll_duration_seconds"]
+    choices = choices or {}
+
+    results = search_pexels_videos_batch(queries, orientation, size)
+    picks = []
+    for i, videos in enumerate(results):
+        ranked = rank_videos(videos, resolution, fps, b_roll_duration)
+        if i in choices and choices[i] < len(ranked):
+            picks.append(ranked[choices[i]])
+        else:
+            picks.append(select_video(videos, resolution, fps, b_roll_duration) if videos else None)
+    output_paths = [os.path.join(output_dir, f"scene_{i}.mp4") for i in range(len(queries))]
+    fetched = fetch_pexels_clips(picks, output_paths, b_roll_duration)
+    return [path if ok else None for path, ok in zip(output_paths, fetched)]
 
 if __name__ == "__main__":
     test_query = "ancient Rome"
@@ -70,6 +255,6 @@ if __name__ == "__main__":
     try:
         video_url = get_pexels_video(test_query)
         if video_url:
-            download_video(video_url, out_path)
+            download_video(video_url, out_path, load_config()["pacing_and_editing"]["b_roll_duration_seconds"])
     except Exception as e:
         print(f"Fetching visuals failed: {e}")
@@ -1,10 +1,78 @@
 import os
+import re
+import json
+import queue
+import shutil
+import hashlib
 import asyncio
+import uuid
+import tempfile
+import threading
+import subprocess
+from typing import Iterator
+import aiohttp
 import edge_tts
-from .utils import load_config
+import ffmpeg
+from .utils import load_config, get_cache_dir
 
-def generate_voiceover(text: str, output_filepath: str) -> str:
-    """Generates an MP3 voiceover using Edge TTS for the given text."""
+# edge-tts reports boundary offsets and durations in 100ns ticks
+TICKS_PER_SECOND = 10_000_000
+
+TTS_ENGINE = "edge-tts"
+
+# Network hiccups and empty streams from the TTS service are worth retrying
+TRANSIENT_TTS_ERRORS = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    edge_tts.exceptions.NoAudioReceived,
+    edge_tts.exceptions.WebSocketError,
+)
+
+def _make_communicate(text: str, voice: str, rate: str, pitch: str) -> edge_tts.Communicate:
+    try:
+        return edge_tts.Communicate(text, voice, rate=rate, pitch=pitch, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 has no boundary option and always emits WordBoundary events
+        return edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+
+def _attach_punctuation(words: list[dict], text: str) -> list[dict]:
+    """Restores script punctuation on boundary words ("Hello" -> "Hello,") so captions break like Whisper output."""
+    tokens = text.split()
+    pos = 0
+    for w in words:
+        core = re.sub(r"\W", "", w['word']).lower()
+        # Look a few tokens ahead in case the voice skipped or merged something
+        for i in range(pos, min(pos + 3, len(tokens))):
+            if core and re.sub(r"\W", "", tokens[i]).lower() == core:
+                w['word'] = tokens[i]
+                pos = i + 1
+                break
+    return words
+
+async def _synthesize(text: str, output_filepath: str, voice: str, rate: str, pitch: str) -> list[dict]:
+    """Streams synthesis to disk and collects WordBoundary events as {word, start, end} dicts."""
+    communicate = _make_communicate(text, voice, rate, pitch)
+    words = []
+    with open(output_filepath, "wb") as f:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                f.write(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / TICKS_PER_SECOND
+                words.append({
+                    "word": chunk["text"],
+                    "start": start,
+                    "end": start + chunk["duration"] / TICKS_PER_SECOND
+                })
+    return _attach_punctuation(words, text)
+
+def generate_voiceover(text: str, output_filepath: str, return_timestamps: bool = False):
+    """Generates an MP3 voiceover using Edge TTS for the given text.
+
+    With return_timestamps=True, returns (output_filepath, words) where words are the TTS word
+    boundaries in the same {word, start, end} shape as subtitle_sync.get_word_timestamps. The list
+    is empty when the voice emits no boundaries, in which case callers should fall back to Whisper.
+    """
     config = load_config()
     voice_model = config['audio_and_voice']['voice_model']
     rate = config['audio_and_voice']['tts_rate']
@@ -12,19 +80,215 @@ def generate_voiceover(text: str, output_filepath: str) -> str:
     
     print(f"Generating voiceover with model {voice_model}...")
     
-    communicate = edge_tts.Communicate(text, voice_model, rate=rate, pitch=pitch)
-    
-    async def save_audio():
-        await communicate.save(output_filepath)
-        
-    asyncio.run(save_audio())
-    print(f"Voiceover saved to {output_filepath}")
+    words = asyncio.run(_synthesize(text, output_filepath, voice_model, rate, pitch))
+    print(f"Voiceover saved to {output_filepath} ({len(words)} word boundaries)")
+    if return_timestamps:
+        return output_filepath, words
     return output_filepath
 
+_STREAM_DONE = object()
+
+def stream_voiceover(text: str, output_filepath: str = None, words: list = None, max_buffered_chunks: int = 64) -> Iterator[bytes]:
+    """Yields MP3 chunks as Edge TTS produces them instead of waiting for the whole narration.
+
+    Each chunk is also appended to output_filepath (if given) as it arrives, and word boundaries are
+    appended to `words` (if given). At most max_buffered_chunks are held in memory, so a slow consumer
+    (e.g. an encoder) applies back-pressure to the TTS stream rather than the narration piling up.
+    """
+    config = load_config()
+    voice_model = config['audio_and_voice']['voice_model']
+    rate = config['audio_and_voice']['tts_rate']
+    pitch = config['audio_and_voice']['tts_pitch']
+
+    chunks = queue.Queue(maxsize=max_buffered_chunks)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def produce():
+        communicate = _make_communicate(text, voice_model, rate, pitch)
+        async for chunk in communicate.stream():
+            if stop.is_set():
+                break
+            if chunk["type"] == "audio":
+                await asyncio.to_thread(put, chunk["data"])
+            elif chunk["type"] == "WordBoundary" and words is not None:
+                start = chunk["offset"] / TICKS_PER_SECOND
+                words.append({"word": chunk["text"], "start": start, "end": start + chunk["duration"] / TICKS_PER_SECOND})
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except Exception as e:
+            put(e)
+        else:
+            put(_STREAM_DONE)
+
+    # edge-tts is async; run it on its own event loop so callers get a plain iterator
+    threading.Thread(target=run, daemon=True).start()
+    out = open(output_filepath, "wb") if output_filepath else None
+    try:
+        while True:
+            item = chunks.get()
+            if item is _STREAM_DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if out:
+                out.write(item)
+            yield item
+    finally:
+        stop.set()
+        if out:
+            out.close()
+    if words is not None:
+        _attach_punctuation(words, text)
+
+def pipe_voiceover(text: str, command: list[str]) -> int:
+    """Streams the voiceover into a subprocess's stdin as it is synthesized (e.g. ffmpeg ... -i pipe:0 ...).
+
+    Returns the process exit code.
+    """
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        for chunk in stream_voiceover(text):
+            proc.stdin.write(chunk)
+    finally:
+        proc.stdin.close()
+    return proc.wait()
+
+async def _synthesize_with_retry(scene_idx: int, text: str, output_filepath: str, voice: str, rate: str, pitch: str,
+                                 semaphore: asyncio.Semaphore, retries: int) -> list[dict]:
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                return await _synthesize(text, output_filepath, voice, rate, pitch)
+            except TRANSIENT_TTS_ERRORS as e:
+                if attempt == retries:
+                    raise
+                delay = 2 ** attempt
+                print(f"Scene {scene_idx} TTS failed ({e!r}), retrying in {delay}s...")
+                await asyncio.sleep(delay)
+
+def _scene_cache_paths(config: dict, text: str, voice: str, rate: str, pitch: str) -> tuple[str, str]:
+    """Per-scene audio cache entry (mp3, word boundaries json) keyed by everything that shapes the speech."""
+    key = hashlib.sha256(json.dumps({
+        "text": text, "voice": voice, "rate": rate, "pitch": pitch, "engine": TTS_ENGINE,
+    }, sort_keys=True).encode()).hexdigest()
+    cache_dir = get_cache_dir(config, "tts_scenes")
+    return os.path.join(cache_dir, f"{key}.mp3"), os.path.join(cache_dir, f"{key}.json")
+
+async def _synthesize_scene_cached(scene_idx: int, text: str, audio_path: str, words_path: str, voice: str, rate: str,
+                                   pitch: str, semaphore: asyncio.Semaphore, retries: int) -> list[dict]:
+    # Unique per synthesis, so a concurrent run (another process sharing the cache) never writes into ours
+    part_path = f"{audio_path}.{uuid.uuid4().hex}.part"
+    try:
+        words = await _synthesize_with_retry(scene_idx, text, part_path, voice, rate, pitch, semaphore, retries)
+    except Exception:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    with open(words_path, "w") as f:
+        json.dump(words, f)
+    os.replace(part_path, audio_path)
+    return words
+
+def _stitch_segments(segment_paths: list[str], padding: float, output_filepath: str, work_dir: str) -> list[float]:
+    """Decodes each segment, joins them with `padding` seconds of silence in between and returns their exact durations."""
+    wav_paths = []
+    for i, path in enumerate(segment_paths):
+        wav_path = os.path.join(work_dir, f"segment_{i:03d}.wav")
+        ffmpeg.input(path).output(wav_path).overwrite_output().run(quiet=True)
+        wav_paths.append(wav_path)
+    durations = [float(ffmpeg.probe(p)['format']['duration']) for p in wav_paths]
+
+    streams = []
+    for i, wav_path in enumerate(wav_paths):
+        stream = ffmpeg.input(wav_path).audio
+        if i < len(wav_paths) - 1 and padding > 0:
+            stream = stream.filter('apad', pad_dur=padding)
+        streams.append(stream)
+    (
+        ffmpeg.concat(*streams, v=0, a=1)
+        .output(output_filepath)
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return durations
+
+def generate_scene_voiceovers(scenes: list[dict], output_filepath: str, max_concurrency: int = None) -> tuple[str, list[dict], list[dict]]:
+    """Synthesizes every scene concurrently with Edge TTS and stitches them into one track.
+
+    Scene audio is cached by (text, voice, rate, pitch, engine), so after a script edit only the changed
+    scenes are re-synthesized; cached scenes reuse their word boundaries, shifted to their new offset.
+
+    Returns (output_filepath, scene_offsets, words): scene_offsets holds {scene, start, end} in seconds
+    on the stitched track, and words are the TTS word boundaries shifted onto that same timeline.
+    """
+    config = load_config()
+    voice_model = config['audio_and_voice']['voice_model']
+    rate = config['audio_and_voice']['tts_rate']
+    pitch = config['audio_and_voice']['tts_pitch']
+    concurrency = max_concurrency or config['audio_and_voice'].get('tts_max_concurrency', 4)
+    retries = config['audio_and_voice'].get('tts_retries', 3)
+    padding = config['pacing_and_editing']['padding_between_sentences_seconds']
+
+    print(f"Generating {len(scenes)} scene voiceovers with model {voice_model} ({concurrency} at a time)...")
+
+    cache_entries = [_scene_cache_paths(config, scene['text'], voice_model, rate, pitch) for scene in scenes]
+    segment_paths = [audio_path for audio_path, _ in cache_entries]
+    scene_words = [None] * len(scenes)
+    for i, (audio_path, words_path) in enumerate(cache_entries):
+        if os.path.exists(audio_path) and os.path.exists(words_path):
+            with open(words_path) as f:
+                scene_words[i] = json.load(f)
+    changed = [i for i, words in enumerate(scene_words) if words is None]
+    # Scenes with identical text share a cache entry: synthesize it once and fan the words out to each of them
+    pending = {}
+    for i in changed:
+        pending.setdefault(cache_entries[i], []).append(i)
+    print(f"{len(scenes) - len(changed)} scenes unchanged, synthesizing {len(pending)}.")
+
+    async def synthesize_changed():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*[
+            _synthesize_scene_cached(indices[0], scenes[indices[0]]['text'], *entry, voice_model, rate, pitch, semaphore, retries)
+            for entry, indices in pending.items()
+        ])
+
+    if pending:
+        for indices, words in zip(pending.values(), asyncio.run(synthesize_changed())):
+            for i in indices:
+                scene_words[i] = words
+
+    work_dir = tempfile.mkdtemp(prefix="tts_", dir=os.path.dirname(os.path.abspath(output_filepath)))
+    try:
+        durations = _stitch_segments(segment_paths, padding, output_filepath, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    scene_offsets = []
+    words = []
+    cursor = 0.0
+    for i, duration in enumerate(durations):
+        scene_offsets.append({"scene": i, "start": cursor, "end": cursor + duration})
+        words.extend({"word": w["word"], "start": w["start"] + cursor, "end": w["end"] + cursor} for w in scene_words[i])
+        cursor += duration + padding
+
+    print(f"Voiceover saved to {output_filepath} ({len(scenes)} scenes, {len(words)} word boundaries)")
+    return output_filepath, scene_offsets, words
+
 if __name__ == "__main__":
     test_text = "Did you know that the Roman Empire lasted for over a thousand years, before finally falling in 476 AD?"
     out_path = os.path.join(os.path.dirname(__file__), "test_voiceover.mp3")
     try:
-        generate_voiceover(test_text, out_path)
+        _, words = generate_voiceover(test_text, out_path, return_timestamps=True)
+        print(words[:5], "...")
     except Exception as e:
         print(f"Voiceover generation failed: {e}")